@@ -0,0 +1,158 @@
+import numpy as np
+from player import *
+from engine import BatchPrisonersDilemmaTournament
+
+"""Exact expected payoffs for SimplePlayers. A SimplePlayer cooperates with
+probability e^c/(1+e^c), c = (constant + lastMoveWeight * opponentLastMove)/2,
+so two of them playing each other form a Markov chain over the 4 states
+(move1, move2) of the last match. Instead of sampling matches, the expected
+payoff of every pair is computed from that chain, all pairs at once."""
+
+# states are numbered 2 * move1 + move2
+STATES = 4
+
+"""P(cooperate | opponent's last move) for every player: column 0 after a
+defection, column 1 after a cooperation"""
+def coopProbabilities(weights):
+    measure = (weights[:, 1:2] + weights[:, 2:3] * np.array([0, 1])) / 2.0
+    return 1 / (1 + np.exp(-measure))
+
+"""The weights that decide how a SimplePlayer plays, with the unused first
+weight zeroed, so that players that play alike have the same genome"""
+def genomeWeights(weights):
+    genomes = np.array(weights, float)
+    genomes[:, 0] = 0
+    return genomes
+
+"""Transition matrices of a batch of pairs, from their probabilities p1, p2
+of cooperating after each opponent move. T[k, s, s'] is the probability of
+pair k going from state s to state s'."""
+def transitions(p1, p2):
+    # q[k, opponent move, own move]
+    q1 = np.stack((1 - p1, p1), axis=-1)
+    q2 = np.stack((1 - p2, p2), axis=-1)
+    # player 1 reacts to move2 and player 2 to move1
+    return np.einsum('nya,nxb->nxyab', q1, q2).reshape(len(p1), STATES,
+                                                        STATES)
+
+"""Stationary distribution of every chain of a batch, solving pi T = pi with
+the entries of pi summing to 1"""
+def stationary(T):
+    system = np.transpose(T, (0, 2, 1)) - np.eye(STATES)
+    system[:, -1, :] = 1
+    rhs = np.zeros((len(T), STATES))
+    rhs[:, -1] = 1
+    return np.linalg.solve(system, rhs)
+
+"""Expected number of visits to each state over numMatches matches that
+start with random moves, like the first matches between two players"""
+def visits(T, numMatches):
+    dist = np.full((len(T), STATES), 1.0 / STATES)
+    total = np.zeros((len(T), STATES))
+    for k in range(numMatches):
+        total += dist
+        dist = np.einsum('ns,nst->nt', dist, T)
+    return total
+
+"""Expected time spent in each state by pairs of players with probabilities
+p1, p2 of cooperating: visits over numMatches matches, or the stationary
+distribution if numMatches is None"""
+def occupancies(p1, p2, numMatches=None):
+    T = transitions(p1, p2)
+    if numMatches is None:
+        return stationary(T)
+    return visits(T, numMatches)
+
+"""Expected payoff of player i against player j, over numMatches matches, or
+per match in the long run if numMatches is None. Yields the rows in blocks
+of (row indices, payoffs against every player), so that memory stays at
+blockSize * N chains. The opponents are the players themselves, unless the
+weights of other opponents are given."""
+def payoffBlocks(weights, payoff, numMatches=None, blockSize=256,
+                 opponents=None):
+    probabilities = coopProbabilities(weights)
+    if opponents is None:
+        against = probabilities
+    else:
+        against = coopProbabilities(opponents)
+    size = len(against)
+    for start in range(0, len(weights), blockSize):
+        rows = np.arange(start, min(start + blockSize, len(weights)))
+        first = np.repeat(rows, size)
+        second = np.tile(np.arange(size), len(rows))
+        occupancy = occupancies(probabilities[first], against[second],
+                                numMatches)
+        yield rows, occupancy.dot(payoff).reshape(len(rows), size)
+
+# the full matrix of expected payoffs of player i against player j
+def payoffMatrix(weights, payoff, numMatches=None, blockSize=256,
+                 opponents=None):
+    if opponents is None:
+        opponents = weights
+    result = np.zeros((len(weights), len(opponents)))
+    for rows, block in payoffBlocks(weights, payoff, numMatches, blockSize,
+                                    opponents):
+        result[rows] = block
+    return result
+
+"""A Prisoner's Dilemma tournament that gives SimplePlayers their exact
+expected score instead of a sampled one: the expected payoff of numMatches
+matches against a random opponent, times the number of rounds. With
+stationary=True each match is scored at the long-run payoff of the pair
+instead. Populations with other players fall back to sampling the matches
+with the batched engine."""
+class AnalyticPrisonersDilemmaTournament(BatchPrisonersDilemmaTournament):
+
+    def __init__(self, players, parallelism, coopcoop, coopdef, defdef,
+                 defcoop, numMatches, numRounds, pairing=None, seed=None,
+                 stationary=False, streams=None, cache=None):
+        super(AnalyticPrisonersDilemmaTournament, self).__init__(players,
+            parallelism, coopcoop, coopdef, defdef, defcoop, numMatches,
+            numRounds, pairing, seed, streams)
+        # payoff of player 1 in each state
+        self.statePayoff = np.array([defdef, defcoop, coopdef, coopcoop],
+                                    float)
+        self.stationary = stationary
+        self.cache = cache # a GenomeCache of expected payoffs, or None
+
+    # true if every player is a SimplePlayer
+    def isMemoryOne(self):
+        if isinstance(self.players, list):
+            return all(type(p) is SimplePlayer for p in self.players)
+        return all(t is SimplePlayer for t, n in self.players.types)
+
+    # scores every player with its expected score
+    def runTournament(self):
+        if not self.isMemoryOne():
+            return super(AnalyticPrisonersDilemmaTournament,
+                         self).runTournament()
+        if isinstance(self.players, list):
+            weights = np.array([p.weights for p in self.players], float)
+        else:
+            weights = self.players.weights[:, :3]
+
+        if self.stationary:
+            numMatches = None
+            perRound = self.numMatches
+        else:
+            numMatches = self.numMatches
+            perRound = 1
+        # a random opponent is any of the other players
+        if self.cache is not None:
+            total = self.cache.totals(genomeWeights(weights), lambda first,
+                second: payoffBlocks(first, self.statePayoff, numMatches,
+                                     opponents=second))
+        else:
+            total = np.zeros(len(weights))
+            for rows, block in payoffBlocks(weights, self.statePayoff,
+                                            numMatches):
+                block[np.arange(len(rows)), rows] = 0
+                total[rows] = block.sum(axis=1)
+        scores = total / (len(weights) - 1) * perRound * self.numRounds
+
+        if isinstance(self.players, list):
+            for player, score in zip(self.players, scores):
+                player.score += score.item()
+        else:
+            self.players.scores += scores
+        return self.players
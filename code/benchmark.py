@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from evolution import *
+from player import *
+from tournament import *
+import json
+import Queue
+import traceback
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import timeit
+
+"""Benchmarks of the simulation. The suite times the Prisoner's Dilemma and
+Blotto tournaments, every evolution and a whole generation (tournament and
+evolution) over a sweep of population sizes, NMovePlayer memory lengths and
+match and round counts, and writes matches per second, generations per
+second and peak memory as JSON. Every case runs in its own process from the
+same seed, so two runs of the suite on the same machine, for example on two
+commits, can be compared case by case:
+
+python benchmark.py [--quick] [--repeat N] [--output FILE] [--compare FILE]
+
+--compare prints the ratio of every case to the same case of an earlier
+output and exits with status 1 if one of them is more than --tolerance
+(10% by default) slower. A case that raises or whose process dies is
+reported with its error instead of a time, and the suite then exits with
+status 1 too.
+
+python benchmark.py --reproduction [numToEvolve ...] [--repeat N]
+
+times the reproduction step of a generation instead: SimpleSex and
+ComplexSex making the children of every couple of parents one Player at a
+time, against the batched kernels of reproduction.py making all the child
+genomes with a few array operations.
+
+python benchmark.py --streams [matches ...]
+
+measures how well tournaments rank players when moves are drawn from the
+random module, from per-pair streams or with common random numbers (see
+streams.py)."""
+
+SEED = 12345 # seed of every case
+repeat = 3 # best of how many runs
+MIN_TIME = 0.2 # shortest measurement of the suite, in seconds
+quick = False # a smaller sweep, for a quick check
+outputPath = None # file the JSON is written to, standard output if None
+comparePath = None # earlier JSON output to compare with, if any
+tolerance = 0.1 # slowdown past which --compare reports a regression
+
+# the sweeps of the suite, and the smaller ones of --quick
+SIZES = [50, 100, 200] # numbers of players
+MEMORIES = [1, 2, 4, 8] # NMovePlayer memory lengths
+MATCHES = [(5, 10), (10, 20)] # (matches per pair, rounds per tournament)
+QUICK_SIZES = [50, 100]
+QUICK_MEMORIES = [1, 4]
+QUICK_MATCHES = [(5, 10)]
+
+# payoffs of the Prisoner's Dilemma, as in main.py
+coopcoop = 4
+coopdef = 0
+defdef = 1
+defcoop = 5
+
+""" the cases of the suite, each a dict naming the benchmark and its
+parameters """
+def cases():
+    sizes, memories, matches = SIZES, MEMORIES, MATCHES
+    if quick:
+        sizes, memories, matches = QUICK_SIZES, QUICK_MEMORIES, QUICK_MATCHES
+    for size in sizes:
+        for memory in memories:
+            for numMatches, numRounds in matches:
+                yield {'benchmark': 'pd-tournament', 'players': size,
+                       'memory': memory, 'matches': numMatches,
+                       'rounds': numRounds}
+    for size in sizes:
+        for numMatches, numRounds in matches:
+            yield {'benchmark': 'blotto-tournament', 'players': size,
+                   'matches': numMatches, 'rounds': numRounds}
+    for evolType in ['SimpleEvolution', 'SimpleSex', 'ComplexSex',
+                     'BlottoEvolution']:
+        for size in sizes:
+            yield {'benchmark': 'evolve', 'evolution': evolType,
+                   'players': size}
+    for size in sizes:
+        for memory in memories:
+            numMatches, numRounds = matches[-1]
+            yield {'benchmark': 'generation', 'players': size,
+                   'memory': memory, 'matches': numMatches,
+                   'rounds': numRounds}
+
+""" the name of a case, which identifies it across runs of the suite """
+def caseName(case):
+    parameters = sorted((key, value) for key, value in case.items()
+                        if key != 'benchmark')
+    return case['benchmark'] + ' ' + \
+        ' '.join('%s=%s' % (key, value) for key, value in parameters)
+
+""" how many players reproduce in a population of size: as in main.py for
+SimpleEvolution, and as many as have at most size children for sex """
+def parentCount(evolType, size):
+    if evolType in ['SimpleSex', 'ComplexSex']:
+        count = 2
+        while (count + 1) * count / 2 <= size:
+            count += 1
+        return count
+    return max(size * 48 / 300, 1)
+
+""" new random players of a case """
+def makePlayers(case):
+    if case['benchmark'] == 'blotto-tournament' or \
+            case.get('evolution') == 'BlottoEvolution':
+        return [BlottoPlayer() for i in range(case['players'])]
+    memory = case.get('memory', MEMORIES[-1])
+    return [NMovePlayer(memory) for i in range(case['players'])]
+
+""" the scored tournament of a case """
+def makeTournament(case, players):
+    if case['benchmark'] == 'blotto-tournament':
+        return BlottoTournament(players, 0, case['matches'], case['rounds'],
+                                10, 100)
+    return PrisonersDilemmaTournament(players, 0, coopcoop, coopdef, defdef,
+        defcoop, case['matches'], case['rounds'])
+
+""" the evolution of a case """
+def makeEvolution(case, players):
+    evolType = case.get('evolution', 'SimpleEvolution')
+    numToEvolve = parentCount(evolType, len(players))
+    numClones = max(len(players) / numToEvolve / 8, 1)
+    if evolType == 'BlottoEvolution':
+        return BlottoEvolution(players, numToEvolve, numClones, 10)
+    evolv = {'SimpleEvolution': SimpleEvolution, 'SimpleSex': SimpleSex,
+             'ComplexSex': ComplexSex}[evolType]
+    return evolv(players, numToEvolve, numClones, NMovePlayer,
+                 players[0].num_moves)
+
+""" returns a function running the timed part of a case on players made
+before the clock starts. Playing a tournament again or evolving the same
+players again takes as long as the first time, so it can be called any
+number of times. """
+def prepare(case):
+    players = makePlayers(case)
+    if case['benchmark'] == 'evolve':
+        for player in players:
+            player.score = random.randrange(0, 1000)
+        evolution = makeEvolution(case, players)
+        return evolution.evolve
+    tournament = makeTournament(case, players)
+    if case['benchmark'] == 'generation':
+        def generation():
+            tournament.runTournament()
+            makeEvolution(case, players).evolve()
+        return generation
+    return tournament.runTournament
+
+""" times a case and returns its result: the best time of one run, the
+throughput and the peak memory of the process """
+def measure(case):
+    random.seed(SEED)
+    try:
+        import numpy
+        numpy.random.seed(SEED)
+    except ImportError:
+        pass
+    function = prepare(case)
+    # short cases are run several times per measurement, like timeit
+    number = 1
+    while timeit.timeit(function, number=number) < MIN_TIME:
+        number *= 2
+    seconds = min(timeit.repeat(function, number=number,
+                                repeat=repeat)) / number
+
+    result = dict(case)
+    result['name'] = caseName(case)
+    result['seconds'] = seconds
+    if case['benchmark'] in ['pd-tournament', 'blotto-tournament']:
+        # every round pairs all players and plays matches games per pair
+        played = case['rounds'] * (case['players'] / 2) * case['matches']
+        result['matchesPerSec'] = played / seconds
+    else:
+        result['generationsPerSec'] = 1 / seconds
+    # kilobytes on Linux
+    result['peakMemoryKb'] = \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+# measures a case in a new process, so that its peak memory is its own,
+# and puts its result or the traceback of its error in results
+def _measureIn(case, results):
+    try:
+        results.put(measure(case))
+    except Exception:
+        results.put(dict(case, name=caseName(case),
+                         error=traceback.format_exc()))
+
+""" runs a case in its own process and returns its result, which has an
+error instead of the measurements if the case raised or its process died """
+def measureProcess(case):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measureIn,
+                                      args=(case, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+            break
+        except Queue.Empty:
+            # a process that returned has put its result
+            if process.exitcode not in [None, 0]:
+                result = dict(case, name=caseName(case), error="process "
+                              "exited with code %d" % process.exitcode)
+                break
+    process.join()
+    return result
+
+""" where and on what the suite ran """
+def environment():
+    env = {'python': platform.python_version(),
+           'platform': platform.platform(),
+           'processor': platform.processor()}
+    try:
+        import numpy
+        env['numpy'] = numpy.__version__
+    except ImportError:
+        env['numpy'] = None
+    try:
+        env['revision'] = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        env['revision'] = None
+    return env
+
+""" the throughput of a result, whatever its benchmark """
+def throughput(result):
+    return result.get('matchesPerSec', result.get('generationsPerSec'))
+
+""" prints the ratio of every case to the same case of an earlier run and
+returns the names of the ones that are more than tolerance slower """
+def compare(old, new):
+    before = dict((result['name'], result) for result in old['results'])
+    regressions = []
+    for result in new['results']:
+        if result['name'] not in before or 'error' in result or \
+                'error' in before[result['name']]:
+            continue
+        ratio = throughput(result) / throughput(before[result['name']])
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = ' SLOWER'
+            regressions.append(result['name'])
+        print >> sys.stderr, "%6.2fx %s%s" % (ratio, result['name'], flag)
+    return regressions
+
+""" runs the suite and writes or compares its results """
+def runSuite():
+    results = []
+    for case in cases():
+        result = measureProcess(case)
+        if 'error' in result:
+            print >> sys.stderr, "    FAILED %s\n%s" % (result['name'],
+                                                      result['error'])
+        else:
+            print >> sys.stderr, "%10.4fs %s" % (result['seconds'],
+                                                 result['name'])
+        results.append(result)
+    report = {'environment': environment(), 'seed': SEED, 'repeat': repeat,
+              'quick': quick, 'results': results}
+
+    if outputPath is None:
+        print json.dumps(report, indent=2, sort_keys=True)
+    else:
+        with open(outputPath, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if comparePath is not None:
+        with open(comparePath) as f:
+            if compare(json.load(f), report):
+                sys.exit(1)
+    if any('error' in result for result in results):
+        sys.exit(1)
+
+""" makes the children of every couple of parents with the per-pair loop """
+def loopChildren(evolution, parents):
+    children = []
+    for i in range(len(parents)):
+        for j in range(i + 1, len(parents)):
+            children.append(evolution._evolve_player(parents[i], parents[j]))
+    return children
+
+""" makes the children of every couple of parents with the batched kernels """
+def batchChildren(evolution, parents):
+    from reproduction import parentPairs
+    first, second = parentPairs(len(parents))
+    first, second = parents[first], parents[second]
+    return evolution.players.children(first, second,
+        evolution._children_weights(first, second))
+
+""" best time, in seconds, of repeat runs of function """
+def best(function):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+""" times the per-pair and the batched reproduction steps """
+def runReproduction(sizes, numMoves=4):
+    import numpy as np
+    from population import Population
+    print "%-12s %8s %8s %12s %12s %8s" % ("operator", "parents", "children",
+                                          "loop (s)", "batched (s)", "speedup")
+    for evolType in [SimpleSex, ComplexSex]:
+        for size in sizes:
+            population = Population.random(NMovePlayer, size, numMoves)
+            population.scores[:] = np.random.randint(0, 100, size)
+            players = population.toPlayers()
+            loop = evolType(players, size, -1, NMovePlayer, numMoves)
+            batch = evolType(population, size, -1, NMovePlayer, numMoves)
+            loopTime = best(lambda: loopChildren(loop, players))
+            batchTime = best(lambda: batchChildren(batch, np.arange(size)))
+            print "%-12s %8d %8d %12.6f %12.6f %8.1f" % (evolType.__name__,
+                size, size * (size - 1) / 2, loopTime, batchTime,
+                loopTime / batchTime)
+
+""" rank correlation between two lists of scores """
+def spearman(first, second):
+    import numpy as np
+    ranks1 = np.argsort(np.argsort(first))
+    ranks2 = np.argsort(np.argsort(second))
+    return np.corrcoef(ranks1, ranks2)[0, 1]
+
+""" how well round-robin tournaments of SimplePlayers with a number of
+matches per pair rank the players, for each way of drawing moves: the rank
+correlation with their exact expected scores, averaged over runs """
+def runStreams(matchCounts, numPlayers=40, runs=20):
+    from analytic import AnalyticPrisonersDilemmaTournament
+    from pairing import RoundRobinPairing
+    from streams import Streams
+    random.seed(SEED)
+    players = [SimplePlayer() for i in range(numPlayers)]
+    modes = [None, 'pair', 'common']
+    print "%8s %12s %12s %12s" % ("matches", "random", "pair", "common")
+    for numMatches in matchCounts:
+        exact = [p.copy() for p in players]
+        AnalyticPrisonersDilemmaTournament(exact, 0, coopcoop, coopdef,
+            defdef, defcoop, numMatches, numPlayers - 1).runTournament()
+        correlations = []
+        for mode in modes:
+            total = 0
+            for run in range(runs):
+                copies = [p.copy() for p in players]
+                for copy, player in zip(copies, players):
+                    copy.id = player.id
+                streams = None
+                if mode is not None:
+                    streams = Streams(run, mode)
+                PrisonersDilemmaTournament(copies, 0, coopcoop, coopdef,
+                    defdef, defcoop, numMatches, numPlayers - 1,
+                    RoundRobinPairing(), streams).runTournament()
+                total += spearman([p.score for p in copies],
+                                  [p.score for p in exact])
+            correlations.append(total / runs)
+        print "%8d %12.3f %12.3f %12.3f" % tuple([numMatches] + correlations)
+
+if __name__ == '__main__':
+    if '--repeat' in sys.argv:
+        index = sys.argv.index('--repeat')
+        repeat = int(sys.argv[index + 1])
+        del sys.argv[index:index + 2]
+
+    if '--reproduction' in sys.argv:
+        sys.argv.remove('--reproduction')
+        sizes = [int(arg) for arg in sys.argv[1:]]
+        runReproduction(sizes or [16, 48, 128])
+        sys.exit(0)
+
+    if '--streams' in sys.argv:
+        sys.argv.remove('--streams')
+        matchCounts = [int(arg) for arg in sys.argv[1:]]
+        runStreams(matchCounts or [2, 5, 10, 20])
+        sys.exit(0)
+
+    if '--quick' in sys.argv:
+        quick = True
+        sys.argv.remove('--quick')
+
+    if '--output' in sys.argv:
+        index = sys.argv.index('--output')
+        outputPath = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+
+    if '--compare' in sys.argv:
+        index = sys.argv.index('--compare')
+        comparePath = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+
+    if '--tolerance' in sys.argv:
+        index = sys.argv.index('--tolerance')
+        tolerance = float(sys.argv[index + 1])
+        del sys.argv[index:index + 2]
+
+    runSuite()
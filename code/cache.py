@@ -0,0 +1,51 @@
+"""A bounded cache that keeps about the capacity most recently used entries.
+Entries live in two plain dicts, recent and old: new and reused entries go
+into recent, and when recent is full it replaces old, dropping everything
+that wasn't used since the last swap. This approximates least-recently-used
+eviction without any per-lookup bookkeeping. It counts its hits and misses
+so that runs can report how much work it saved."""
+class LRUCache(object):
+    def __init__(self, capacity):
+        self.capacity = capacity # maximum number of entries
+        self.recent = {}
+        self.old = {}
+        self.hits = 0
+        self.misses = 0
+        pass
+
+    # returns the value stored for key, or default if there is none
+    def get(self, key, default=None):
+        if key in self.recent:
+            self.hits += 1
+            return self.recent[key]
+        if key in self.old:
+            self.hits += 1
+            value = self.old.pop(key)
+            self.put(key, value)
+            return value
+        self.misses += 1
+        return default
+
+    # stores value for key
+    def put(self, key, value):
+        if len(self.recent) >= (self.capacity + 1) / 2:
+            self.old = self.recent
+            self.recent = {}
+        self.recent[key] = value
+
+    def __len__(self):
+        return len(self.recent) + len(self.old)
+
+    def __contains__(self, key):
+        return key in self.recent or key in self.old
+
+    # fraction of lookups that were hits
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return float(self.hits) / lookups
+
+    def __str__(self):
+        return "%d hits, %d misses (%.1f%% hit rate), %d entries" % \
+            (self.hits, self.misses, 100 * self.hitRate(), len(self))
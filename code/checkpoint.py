@@ -0,0 +1,76 @@
+import os
+import json
+import random
+import numpy as np
+import player
+from population import Population
+
+"""Checkpoints of a running experiment. A checkpoint is a single .npz file
+with the population arrays of the generation about to be played, the state
+of both random generators (random and numpy.random), the next player id, the
+generation counter and the configuration of the run. It is written to a
+temporary file that is renamed over the previous checkpoint, so a crash
+while writing leaves the previous one intact. Restoring a checkpoint and
+running on gives exactly the same generations as the uninterrupted run."""
+
+"""Writes the checkpoint of a run that is about to play generation
+generation with the given players (a Population or a list of Players)"""
+def saveCheckpoint(path, generation, players, operator, config):
+    compact = not isinstance(players, list)
+    if compact:
+        population = players
+    else:
+        population = Population.fromPlayers(players)
+
+    version, internal, gauss = random.getstate()
+    npState = np.random.get_state()
+    meta = {'generation': generation, 'operator': operator,
+            'config': config, 'compact': compact, 'nextId': player.nextId,
+            'types': [[t.__name__, n] for t, n in population.types],
+            'randomVersion': version, 'randomGauss': gauss,
+            'numpyPos': npState[2], 'numpyHasGauss': npState[3],
+            'numpyGauss': npState[4]}
+
+    partial = path + '.partial'
+    with open(partial, 'wb') as f:
+        np.savez(f, weights=population.weights, kinds=population.kinds,
+                 scores=population.scores, ids=population.ids,
+                 parents=population.parents,
+                 randomState=np.array(internal, dtype=np.int64),
+                 numpyKeys=npState[1], meta=np.array(json.dumps(meta)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(partial, path)
+
+"""A checkpoint read back from disk"""
+class Checkpoint(object):
+    def __init__(self, path):
+        data = np.load(path)
+        meta = json.loads(str(data['meta']))
+        self.generation = meta['generation'] # next generation to play
+        self.operator = meta['operator'] # operator that produced it
+        self.config = meta['config']
+        types = [(getattr(player, name), n) for name, n in meta['types']]
+        population = Population(data['weights'], data['kinds'], types,
+                                data['scores'], data['ids'], data['parents'])
+        self.compact = meta['compact']
+        self.population = population
+        self.nextId = meta['nextId']
+        self.randomState = (meta['randomVersion'],
+                            tuple(int(x) for x in data['randomState']),
+                            meta['randomGauss'])
+        self.numpyState = ('MT19937', data['numpyKeys'], meta['numpyPos'],
+                           meta['numpyHasGauss'], meta['numpyGauss'])
+
+    """Returns the players, as saved, and puts the random generators and
+    the player ids back where they were. This must come after anything else
+    that draws random numbers or creates players."""
+    def restore(self):
+        if self.compact:
+            players = self.population
+        else:
+            players = self.population.toPlayers()
+        random.setstate(self.randomState)
+        np.random.set_state(self.numpyState)
+        player.nextId = self.nextId
+        return players
@@ -0,0 +1,253 @@
+import numpy as np
+from player import *
+from tournament import PrisonersDilemmaTournament, BlottoTournament
+
+"""Batched engines. For Prisoner's Dilemma, instead of asking every Player
+object for its move, the weights and attrs of the whole population are packed
+into 2-D arrays (one row per player, padded with -1 attrs for shorter
+memories) and every pair of a round plays its match at once. The arrays follow
+the exact rules of Player.playerDot, returnMove and informMove, so a batched
+tournament gives the same score distribution as the object-based one. For
+Blotto, every player is compared with every other one by broadcasting."""
+
+class PlayerArrays(object):
+    def __init__(self, size, width):
+        self.size = size
+        self.weights = self.allocate('weights', (size, width), float, 0)
+        self.attrs = self.allocate('attrs', (size, width), float, -1)
+        # columns past a player's own memory always stay at -1
+        self.valid = self.allocate('valid', (size, width), bool, False)
+        # only NMovePlayers keep track of their own cooperation rate
+        self.tracksCoops = self.allocate('tracksCoops', size, bool, False)
+        self.coops = self.allocate('coops', size, float, 0)
+        self.movesPlayed = self.allocate('movesPlayed', size, float, 0)
+        self.scores = self.allocate('scores', size, float, 0)
+
+    # a new array filled with fill; subclasses may keep it elsewhere than
+    # in the process's own memory
+    def allocate(self, name, shape, dtype, fill):
+        return np.full(shape, fill, dtype=dtype)
+
+    """Packs a list of Player objects, including their histories"""
+    @classmethod
+    def fromPlayers(cls, players):
+        arrays = cls(len(players), max(len(p.weights) for p in players))
+        for i, p in enumerate(players):
+            arrays.weights[i, :len(p.weights)] = p.weights
+            arrays.attrs[i, :len(p.attrs)] = p.attrs
+            arrays.valid[i, :len(p.attrs)] = True
+            arrays.scores[i] = p.score
+            if isinstance(p, NMovePlayer):
+                arrays.tracksCoops[i] = True
+                arrays.coops[i] = p.coops
+                arrays.movesPlayed[i] = p.moves_played
+        return arrays
+
+    """Packs a Population, whose players haven't played any moves yet"""
+    @classmethod
+    def fromPopulation(cls, population):
+        arrays = cls(len(population), population.weights.shape[1])
+        arrays.weights[:] = population.weights
+        arrays.valid[:] = np.arange(arrays.weights.shape[1]) < \
+            population.lengths[:, np.newaxis]
+        # the constant attribute is always 1
+        arrays.attrs[:, 1] = 1
+        arrays.scores[:] = population.scores
+        nmove = [i for i, (t, n) in enumerate(population.types)
+                 if t is NMovePlayer]
+        arrays.tracksCoops[:] = np.in1d(population.kinds, nmove)
+        return arrays
+
+    # writes scores and histories back into the player objects
+    def unpack(self, players):
+        for i, p in enumerate(players):
+            p.score = self.scores[i].item()
+            p.attrs = self.attrs[i, :len(p.attrs)].tolist()
+            if self.tracksCoops[i]:
+                p.coops = int(self.coops[i])
+                p.moves_played = int(self.movesPlayed[i])
+
+"""Counts the attrs equal to 0 or 1 in each row, like attrs.count(0) +
+attrs.count(1) does for a single player."""
+def countMoves(attrs):
+    return ((attrs == 0) | (attrs == 1)).sum(axis=1)
+
+"""Playerdot for a batch of rows: the dot product of the weights with the
+initialized attrs, divided by the number of moves seen."""
+def batchDot(weights, attrs):
+    initialized = np.where(attrs != -1, attrs, 0)
+    return (weights * initialized).sum(axis=1) / countMoves(attrs)
+
+"""Computes the moves of the players in rows me against the players in rows
+opp, and updates the cooperation counts of the NMovePlayers among them.
+With common=True, one random number is drawn for all of them."""
+def batchMoves(arrays, me, opp, rng, common=False):
+    # players whose opponent has not been informed of any move yet
+    fresh = countMoves(arrays.attrs[opp]) == 1
+
+    # uses the formula p = e^c/(1+e^c), written as 1/(1+e^-c) so that large
+    # measures do not overflow
+    measure = batchDot(arrays.weights[me], arrays.attrs[me])
+    probability = 1 / (1 + np.exp(-measure))
+    # with common random numbers, all players draw the same number
+    size = 1 if common else len(me)
+    moves = (rng.random_sample(size) < probability).astype(int)
+    moves = np.where(fresh, rng.randint(0, 2, size), moves)
+
+    # updates the number of cooperations and moves played
+    tracks = arrays.tracksCoops[me]
+    coops = np.where(fresh, moves, arrays.coops[me] + moves)
+    played = np.where(fresh, 1, arrays.movesPlayed[me] + 1)
+    arrays.coops[me] = np.where(tracks, coops, arrays.coops[me])
+    arrays.movesPlayed[me] = np.where(tracks, played, arrays.movesPlayed[me])
+    arrays.attrs[me, 0] = np.where(tracks, coops / played,
+                                   arrays.attrs[me, 0])
+    return moves
+
+"""Pushes the opponent moves into the last n moves of the players in rows
+me, shifting the older moves forward."""
+def batchInform(arrays, me, moves):
+    history = arrays.attrs[me, 2:]
+    shifted = np.column_stack((moves, history[:, :-1]))
+    arrays.attrs[me, 2:] = np.where(arrays.valid[me, 2:], shifted, -1)
+
+"""Plays a single match between every pair (first[k], second[k]) of the
+arrays, with payoff[move1, move2] the payoff of a player making move1
+against move2. Returns the number of cooperative moves."""
+def batchMatch(arrays, first, second, payoff, rng, common=False):
+    # the moves the players will choose. second moves after first, so it
+    # sees the cooperation rate first has just updated.
+    move1 = batchMoves(arrays, first, second, rng, common)
+    move2 = batchMoves(arrays, second, first, rng, common)
+
+    # updates player's information to keep track of opponent's last moves
+    batchInform(arrays, first, move2)
+    batchInform(arrays, second, move1)
+
+    # determines the outcome of the matches and updates the scores
+    arrays.scores[first] += payoff[move1, move2]
+    arrays.scores[second] += payoff[move2, move1]
+    return int(move1.sum() + move2.sum())
+
+"""A Prisoner's Dilemma tournament that runs all pairs of a round as one
+batch of array operations."""
+class BatchPrisonersDilemmaTournament(PrisonersDilemmaTournament):
+    # the arrays players are packed into
+    arrayType = PlayerArrays
+
+    def __init__(self, players, parallelism, coopcoop, coopdef, defdef,
+                 defcoop, numMatches, numRounds, pairing=None, seed=None,
+                 streams=None):
+        super(BatchPrisonersDilemmaTournament, self).__init__(players,
+            parallelism, coopcoop, coopdef, defdef, defcoop, numMatches,
+            numRounds, pairing, streams)
+        # payoff[move1][move2] is the payoff of a player making move1
+        # against an opponent making move2
+        self.payoff = np.array([[defdef, defcoop], [coopdef, coopcoop]])
+        # without a seed, moves come from the global numpy generator, so
+        # that seeding and checkpointing it covers the whole run
+        if seed is None:
+            self.rng = np.random
+        else:
+            self.rng = np.random.RandomState(seed)
+
+    # runs a specified number of rounds on the packed population
+    def runTournament(self):
+        self.pairing.schedule(len(self.players), self.numRounds)
+        # compact populations are packed straight from their arrays
+        if isinstance(self.players, list):
+            self.arrays = self.arrayType.fromPlayers(self.players)
+        else:
+            self.arrays = self.arrayType.fromPopulation(self.players)
+        for self.round in range(0, self.numRounds):
+            self.runRound()
+        if isinstance(self.players, list):
+            self.arrays.unpack(self.players)
+        else:
+            self.players.scores[:] = self.arrays.scores
+        return self.players
+
+    # runs a specified number of matches between every pair at once
+    def runRound(self):
+        # with streams, each round draws from its own RandomState
+        if self.streams is not None:
+            self.rng = self.streams.roundState(self.round)
+        order = np.asarray(self.createPairing())
+        numPaired = len(order) - len(order) % 2
+        first = order[0:numPaired:2]
+        second = order[1:numPaired:2]
+        for j in range(0, self.numMatches):
+            self.runBatchMatch(first, second)
+
+    # the scores live in the packed arrays while the tournament runs
+    def scores(self):
+        return self.arrays.scores
+
+    # runs a single match between every pair (first[k], second[k])
+    def runBatchMatch(self, first, second):
+        common = self.streams is not None and self.streams.common()
+        self.cooperations += batchMatch(self.arrays, first, second,
+                                        self.payoff, self.rng, common)
+        self.moves += 2 * len(first)
+
+    # runs a single match of Prisoner's Dilemma between two players
+    def runSingleMatch(self, p1, p2):
+        self.runBatchMatch(np.array([p1]), np.array([p2]))
+
+"""Castles won by every allocation in first against every allocation in
+second, as a (len(first), len(second)) array: 1 for each castle with more
+soldiers, 0.5 for each castle with as many."""
+def castlesWonMatrix(first, second):
+    # 16 bits hold the differences of any allocations of up to 32767
+    # soldiers; 8 bits would wrap above 127
+    diff = first[:, np.newaxis, :].astype(np.int16) - \
+        second[np.newaxis, :, :].astype(np.int16)
+    return (diff > 0).sum(axis=2) + 0.5 * (diff == 0).sum(axis=2)
+
+"""Yields the castles-won matrix of a population against itself, or
+against the allocations of other opponents if given, in blocks of (row
+indices, castles won against every opponent), with blocks small enough that
+the comparisons of a block take about maxCells bytes."""
+def castlesWonBlocks(allocations, maxCells=2**25, opponents=None):
+    if opponents is None:
+        opponents = allocations
+    size, castles = opponents.shape
+    # each comparison is a 2 byte difference
+    blockSize = max(1, maxCells / (2 * size * castles))
+    for start in range(0, len(allocations), blockSize):
+        rows = np.arange(start, min(start + blockSize, len(allocations)))
+        yield rows, castlesWonMatrix(allocations[rows], opponents)
+
+"""A Blotto tournament where every player plays every other player, computed
+with array operations over an (N, castles) array of allocations. A player's
+score is its castles won against the average opponent, times the number of
+matches it would play in the random-pairing tournament, so scores stay on
+the same scale. The cache, if any, is a GenomeCache (see genomecache.py)."""
+class BatchBlottoTournament(BlottoTournament):
+
+    # scores every player against all the others
+    def runTournament(self):
+        if isinstance(self.players, list):
+            allocations = np.array([p.weights for p in self.players], int)
+        else:
+            allocations = self.players.weights.astype(int)
+
+        if self.cache is not None:
+            # only pairs of allocations never seen before are compared
+            total = self.cache.totals(allocations, lambda first, second:
+                castlesWonBlocks(first, opponents=second))
+        else:
+            total = np.zeros(len(allocations))
+            for rows, block in castlesWonBlocks(allocations):
+                # leaves out each player's match against itself
+                block[np.arange(len(rows)), rows] = 0
+                total[rows] = block.sum(axis=1)
+        scores = total / (len(allocations) - 1) * \
+            self.numMatches * self.numRounds
+
+        if isinstance(self.players, list):
+            for player, score in zip(self.players, scores):
+                player.score += score.item()
+        else:
+            self.players.scores += scores
+        return self.players
@@ -1,12 +1,23 @@
 import random
 from player import SimplePlayer, BlottoPlayer, NMovePlayer
+from selection import TopSelection
 import math
 
 # An interface for classes that implements different evolution methods.
 class Evolution(object):
-    def __init__(self, players):
+    def __init__(self, players, selection=None):
         self.players = players
+        # chooses the players that reproduce, the best ones by default
+        if selection is None:
+            selection = TopSelection()
+        self.selection = selection
         pass
+
+    # the scores of the players, as a list or as the population's array
+    def scores(self):
+        if isinstance(self.players, list):
+            return [player.score for player in self.players]
+        return self.players.scores
     
     """Return new set of players"""
     def evolve(self):
@@ -15,8 +26,8 @@ class Evolution(object):
 # Class for Simple Evolution. Randomly perturbs the weights slightly.
 class SimpleEvolution(Evolution):
     def __init__(self, players, numToEvolve, numClones,\
-                 playerType, numMoves=1):
-        super(SimpleEvolution, self).__init__(players)
+                 playerType, numMoves=1, selection=None):
+        super(SimpleEvolution, self).__init__(players, selection)
         self.numToEvolve = numToEvolve # how many players to evolve
         self.numClones = numClones # how many clones to make of each player
         self.playerType = playerType # Simple or NMove
@@ -29,19 +40,22 @@ class SimpleEvolution(Evolution):
         if self.numToEvolve*self.numClones > len(self.players):
             raise BadBoundsException("Too many players")
 
-        # sorts the players by their score
-        sortedPlayers = sorted(self.players, key=lambda player: -player.score)
+        # compact populations evolve with slice operations
+        if not isinstance(self.players, list):
+            return self._evolve_population()
+
+        # chooses the players to evolve, the top players by default
+        chosen = self.selection.select(self.scores(), self.numToEvolve)
 
         # creates new set of players
         newPlayers = []
 
-        # chooses top players
-        for i in range(self.numToEvolve):
+        for i in chosen:
             # evolves each player selected by cloning and perturbing slightly
             for j in range(self.numClones):
-                newPlayers.append(self._evolve_player(sortedPlayers[i]))
+                newPlayers.append(self._evolve_player(self.players[i]))
         # adds random new players        
-        for i in range(self.numToEvolve*self.numClones, len(sortedPlayers)):
+        for i in range(self.numToEvolve*self.numClones, len(self.players)):
             newPlayers.append(self.playerType(self.numMoves))
         return newPlayers
 
@@ -54,13 +68,29 @@ class SimpleEvolution(Evolution):
         newPlayer.weights[index] += random.uniform(-0.01, 0.01)
         return newPlayer
 
+    """Return the new Population: clones of the top players, perturbed, and
+    random new players"""
+    def _evolve_population(self):
+        from population import Population
+        parents = self.selection.select(self.players.scores, self.numToEvolve)
+        clones = self.players.take(parents.repeat(self.numClones))
+        self._evolve_clones(clones)
+        fresh = Population.random(self.playerType,
+                                  len(self.players) - len(clones),
+                                  self.numMoves)
+        return Population.concat([clones, fresh])
+
+    # perturbs a random weight of every clone by .01
+    def _evolve_clones(self, clones):
+        clones.perturb(0.01)
+
 """Each of the players selected to reproduce will sexually reproduce with
 each of the other players selected to reproduce, and each couple will have
 a certain number of children"""
 class SimpleSex(Evolution):
     def __init__(self, players, numToEvolve, numClones=-1, \
-                 playerType=SimplePlayer, numMoves=1):
-        super(SimpleSex, self).__init__(players)
+                 playerType=SimplePlayer, numMoves=1, selection=None):
+        super(SimpleSex, self).__init__(players, selection)
         self.numToEvolve = numToEvolve
         self.playerType = playerType
         self.numMoves = numMoves
@@ -68,21 +98,25 @@ class SimpleSex(Evolution):
 
     """Return new set of players"""
     def evolve(self):
-        print self.numToEvolve, self.__choose(self.numToEvolve, 2)
         if self.__choose(self.numToEvolve,2) > len(self.players):
             raise BadBoundsException("Too many players")
 
-        # sorts the players
-        sortedPlayers = sorted(self.players, key=lambda player: -player.score)
+        # compact populations make all children at once
+        if not isinstance(self.players, list):
+            return self._evolve_population()
+
+        # chooses the parents, the top players by default
+        parents = [self.players[i] for i in
+                   self.selection.select(self.scores(), self.numToEvolve)]
         newPlayers = []
-        # loops through top players
+        # loops through the parents
         for i in range(self.numToEvolve):
             # creates children with each of the other players
             for j in range(i + 1, self.numToEvolve):
-                newPlayers.append(self._evolve_player(sortedPlayers[i],\
-                                                      sortedPlayers[j]))
+                newPlayers.append(self._evolve_player(parents[i],\
+                                                      parents[j]))
         # adds randomly generated players
-        for i in range(self.__choose(self.numToEvolve,2), len(sortedPlayers)):
+        for i in range(self.__choose(self.numToEvolve,2), len(self.players)):
             newPlayers.append(self.playerType(self.numMoves))
         return newPlayers
 
@@ -90,12 +124,32 @@ class SimpleSex(Evolution):
     def _evolve_player(self, player1, player2):
         # clones player 1
         newPlayer = player1.copy()
+        newPlayer.parents = (player1.id, player2.id)
         for i in range(len(newPlayer.weights)):
             # averages the weights of the parent players
             newPlayer.weights[i] = \
                 (player1.weights[i] + player2.weights[i]) / 2
         return newPlayer
 
+    """Return the new Population: the children of every couple of parents,
+    made with array operations, and random new players"""
+    def _evolve_population(self):
+        from population import Population
+        from reproduction import parentPairs
+        parents = self.selection.select(self.players.scores, self.numToEvolve)
+        first, second = parentPairs(len(parents))
+        children = self.players.children(parents[first], parents[second],
+            self._children_weights(parents[first], parents[second]))
+        fresh = Population.random(self.playerType,
+                                  len(self.players) - len(children),
+                                  self.numMoves)
+        return Population.concat([children, fresh])
+
+    # the genomes of the children of the couples (first[k], second[k])
+    def _children_weights(self, first, second):
+        from reproduction import averageChildren
+        return averageChildren(self.players.weights, first, second)
+
     #calculates nCr
     def __choose(self,n,r):
         f = math.factorial
@@ -108,15 +162,17 @@ a weighted average of all the parents attributes based on score. Assumes scores
 are nonnegative."""
 class ComplexSex(SimpleSex):
     def __init__(self, players, numToEvolve, numClones=-1,
-                 playerType=SimplePlayer, numMoves=1):
+                 playerType=SimplePlayer, numMoves=1, selection=None):
         super(ComplexSex, self).__init__(players, numToEvolve,
-                                         numClones, playerType, numMoves)
+                                         numClones, playerType, numMoves,
+                                         selection)
         pass
 
     """Create a child by using a weighted average of the parents' attributes,
     based on parents' score. """
     def _evolve_player(self, player1, player2):
         newPlayer = player1.copy()
+        newPlayer.parents = (player1.id, player2.id)
         score1 = player1.score
         score2 = player2.score
         """If both scores are zero, weight each parent equally by artificially
@@ -133,11 +189,19 @@ class ComplexSex(SimpleSex):
                 (weight1 * score1 + weight2 * score2) / (score1 + score2)
         return newPlayer
 
+    # the genomes of the children of the couples (first[k], second[k])
+    def _children_weights(self, first, second):
+        from reproduction import weightedChildren
+        return weightedChildren(self.players.weights, self.players.scores,
+                                first, second)
+
 """A class to evolve Blotto players"""
 class BlottoEvolution(SimpleEvolution):
-    def __init__(self, players, numToEvolve, numClones, numCastles=10):
+    def __init__(self, players, numToEvolve, numClones, numCastles=10,
+                 selection=None):
         super(BlottoEvolution, self).__init__(players, numToEvolve, numClones,\
-                                              BlottoPlayer, numCastles)
+                                              BlottoPlayer, numCastles,
+                                              selection)
         pass
 
     def _evolve_player(self, player):
@@ -155,3 +219,6 @@ class BlottoEvolution(SimpleEvolution):
             newPlayer.weights[index2] -= change
         return newPlayer
 
+    # moves 0 or 1 soldiers between two random castles of every clone
+    def _evolve_clones(self, clones):
+        clones.transfer(2, 100)
@@ -0,0 +1,678 @@
+import math
+import random
+import time
+
+"""Runs experiments from a program. An experiment is one run of the genetic
+algorithm, described by a dict of settings; settings that aren't given keep
+the values of DEFAULTS:
+
+    from experiment import runExperiment
+    result = runExperiment({'game': 'nmoves', 'evolution': 'complex',
+                            'generations': 20, 'seed': 1})
+
+runExperiment returns a dict with the final players, the best score of
+every generation and the weights of the last generation's best player
+(with 'islands', the players, best scores and best weights of every
+island instead). Importing this module only defines things; the game, the
+tournaments and numpy are imported when an experiment first needs them, and
+an experiment leaves no settings behind, so one process can run any number
+of experiments one after another. main.py is the command-line interface to
+the same function."""
+
+DEFAULTS = {
+    'game': 'simple', # 'simple', 'nmoves', 'mixed' or 'blotto'
+    'evolution': 'simpleevol', # 'simpleevol', 'simplesex' or 'complex'
+    'numPlayers': 300, # total number of players at each generation
+    'generations': 100, # how many times do we evolve?
+    'matches': 10, # how many rounds in a generation of a tournament?
+    'rounds': 20, # number of times players play each other in a match
+    # how many of the best players should go to next generation: 48 for
+    # simpleevol, 20 for simplesex and complex, if not given
+    'numToEvolve': None,
+    'numClones': 6, # number of (mutated) clones in next generation
+    'coopcoop': 4, # payoff if both cooperate
+    'coopdef': 0, # payoff to Player 1 if he cooperates and Player 2 defects
+    'defdef': 1, # payoff if both defect
+    'defcoop': 5, # payoff to Player 1 if he defects and Player 2 cooperates
+    'memory': 4, # moves remembered by NMovePlayers
+    # play nmoves and mixed with LookupPlayers, which ignore the cooperation
+    # rate and look their moves up in a table
+    'lookup': False,
+    'batched': False, # play Prisoner's Dilemma rounds with the batched engine
+    'parallelism': 0, # worker processes per tournament, 0 = sequential
+    'pairing': 'random', # how players are paired in each round, see pairing.py
+    'selection': 'top', # how players are chosen to reproduce, see selection.py
+    'compact': False, # keep the population in arrays, not Player objects
+    'analytic': False, # score SimplePlayers with their exact expected payoff
+    'cacheSize': 0, # Blotto pairs of allocations kept, 0 = no cache
+    # genomes whose outcomes are kept by batched Blotto and analytic scoring,
+    # 0 = none; memory grows with its square, see genomecache.py
+    'genomeCacheSize': 0,
+    'results': None, # directory every generation is streamed to, if set
+    'seed': None, # seed of the random generators, if given
+    'checkpoint': None, # file the run is checkpointed to, if set
+    'checkpointEvery': 10, # generations between checkpoints
+    'resume': None, # checkpoint file the run continues from, if set
+    'islands': 0, # islands evolving in their own processes, 0 = one population
+    'migrationInterval': 5, # generations between migrations between islands
+    'numMigrants': 5, # players each island sends to each of its neighbors
+    'topology': 'ring', # which islands are neighbors: 'ring' or 'full'
+    # draw moves from seeded streams per pair ('pair') or per seat with
+    # common random numbers ('common'), see streams.py; None = random module
+    'streams': None,
+    # race the players for the numToEvolve top places, stopping players
+    # whose place is sure and halving the others (Prisoner's Dilemma with
+    # Player objects only)
+    'racing': False,
+    'racingConfidence': 2.0, # half-width of the intervals in standard errors
+    # rounds everyone plays before players are stopped, and between halvings
+    'racingMinRounds': 3,
+    # stop when no weight of the best strategy moved by more than this for
+    # patience generations in a row; None = run all generations
+    'convergence': None,
+    'patience': 5,
+    # graph the players live on, see spatial.py: 'grid' or 'smallworld';
+    # None = a well-mixed population
+    'graph': None,
+    'degree': 4, # neighbors of each node of the graph
+    'rewiring': 0.1, # probability a small-world link is moved
+    'mutation': 0.01, # probability a node of a graph mutates each generation
+    # scores kept by the quantile sketch of each generation, and pairs of
+    # genomes sampled for its diversity, see stats.py
+    'statsSample': 1000,
+    'instrument': False, # time and count the phases of each generation
+    'profile': None, # directory of per-generation cProfile dumps, if set
+    'verbose': False, # print the progress of the run
+    }
+
+# the settings that describe a run, saved with its checkpoints and restored
+# when it resumes
+CONFIG = ['game', 'evolution', 'numPlayers', 'generations', 'matches',
+          'rounds', 'numToEvolve', 'numClones', 'coopcoop', 'coopdef',
+          'defdef', 'defcoop', 'memory', 'lookup', 'batched', 'parallelism',
+          'pairing', 'selection', 'compact', 'analytic', 'cacheSize',
+          'genomeCacheSize', 'results', 'seed', 'checkpoint',
+          'checkpointEvery', 'islands', 'migrationInterval', 'numMigrants',
+          'topology', 'streams', 'racing', 'racingConfidence',
+          'racingMinRounds', 'convergence', 'patience', 'graph', 'degree',
+          'rewiring', 'mutation', 'statsSample']
+
+"""Runs the experiment described by config and returns its result. The
+listener, if given, is called with a summary dict of every generation."""
+def runExperiment(config, listener=None):
+    return Experiment(config, listener).run()
+
+"""One run of the genetic algorithm. Its settings are attributes named after
+the keys of DEFAULTS."""
+class Experiment(object):
+    def __init__(self, config, listener=None):
+        for name in config:
+            if name not in DEFAULTS:
+                raise ValueError("unknown setting " + name)
+        settings = dict(DEFAULTS)
+        # a resumed run keeps the settings it was started with, except for
+        # the ones given now
+        self.restored = None
+        if config.get('resume') is not None:
+            from checkpoint import Checkpoint
+            self.restored = Checkpoint(config['resume'])
+            settings.update((name, value) for name, value
+                            in self.restored.config.items()
+                            if name in CONFIG)
+        settings.update(config)
+        self.__dict__.update(settings)
+        self.settings = settings
+        if self.racing and (self.analytic or self.batched or self.compact or
+                            self.game == 'blotto' or self.graph is not None):
+            raise ValueError("racing only runs Prisoner's Dilemma tournaments "
+                             "of Player objects, not analytic, batched, "
+                             "compact, Blotto or spatial runs")
+        if self.islands > 0 and (self.checkpoint is not None or
+                                 self.restored is not None or
+                                 self.results is not None):
+            raise ValueError("island runs can't be checkpointed or streamed "
+                             "to a results directory")
+
+        self.writer = None # streams every generation to results, if set
+        self.instruments = None # times the phases of generations, if set
+        self.bestScores = [] # best score of every generation played
+        self.bestWeights = None # weights of the best player of the last one
+        self.stable = 0 # generations in a row the best weights didn't move
+        self.matchesPlayed = 0 # matches played by racing tournaments
+        self.matchesSaved = 0 # matches racing tournaments didn't have to play
+        self.cache = None # outcomes shared by all generations, if cached
+        self.listener = listener # called with every generation's summary
+        self.generationStart = None # when the current generation started
+
+    # prints the progress of the run, like print, when verbose
+    def say(self, *args):
+        if self.verbose:
+            print ' '.join(str(arg) for arg in args)
+
+    """Runs the experiment and returns its result"""
+    def run(self):
+        if self.seed is not None:
+            random.seed(self.seed)
+            # the batched engine and compact populations draw from numpy
+            try:
+                import numpy
+                numpy.random.seed(self.seed)
+            except ImportError:
+                pass
+        if self.results is not None:
+            from results import ResultsWriter
+            self.writer = ResultsWriter(self.results)
+        if self.instrument or self.profile is not None:
+            from instrument import Instruments
+            self.instruments = Instruments(self.profile, self.verbose)
+            self.instruments.install()
+        try:
+            return self.runGame()
+        finally:
+            if self.instruments is not None:
+                self.instruments.uninstall()
+            if self.writer is not None:
+                self.writer.close()
+
+    # runs the game of the settings
+    def runGame(self):
+        from evolution import SimpleEvolution, SimpleSex, ComplexSex
+        from selection import selections
+        from pairing import pairings
+        if self.selection not in selections:
+            self.say("invalid selection. defaulting to top")
+            self.selection = 'top'
+        if self.pairing not in pairings:
+            self.say("invalid pairing. defaulting to random")
+            self.pairing = 'random'
+
+        # map from evolution string to class type
+        evol = {
+               'simpleevol':SimpleEvolution,
+               'simplesex':SimpleSex,
+               'complex':ComplexSex,
+               }
+        if self.numToEvolve is None:
+            self.numToEvolve = 48
+            if self.evolution != 'simpleevol' and \
+                    self.game in ['simple', 'nmoves']:
+                self.numToEvolve = 20
+
+        if self.graph is not None:
+            return self.runSpatial()
+        if self.game == 'simple':
+            return self.runSimple(evol)
+        if self.game == 'nmoves':
+            return self.runNMoves(evol)
+        if self.game == 'mixed':
+            return self.runMixed()
+        if self.game == 'blotto':
+            return self.runBlotto()
+        raise ValueError("invalid game " + str(self.game))
+
+    # the evolution class of the settings
+    def evolutionType(self, evol):
+        try:
+            evolv = evol[self.evolution]
+        except KeyError:
+            self.say("invalid evolution type. defaulting to SimpleEvolution")
+            evolv = evol['simpleevol']
+        self.say("Using Evolution type", evolv.__name__)
+        return evolv
+
+    # a new selection of the settings
+    def makeSelection(self):
+        from selection import selections
+        return selections[self.selection]()
+
+    """For 1-move memory players, calculates probabilities given the log odds
+    formula shown in the specs."""
+    def calcCoopDef(self, weights):
+        val = math.exp(weights[1] + weights[2])
+        self.say("P(cooperate|defect) = ", (math.exp(weights[1]) / \
+          (1 + math.exp(weights[1]))))
+        self.say("P(cooperate|cooperate) = ", (val / (1 + val)))
+
+    """ creates the Prisoner's Dilemma tournament for a generation of
+    players """
+    def makeTournament(self, players):
+        from pairing import pairings
+        # each tournament's streams are seeded from the random module, so
+        # seeded runs repeat
+        streams = None
+        if self.streams is not None:
+            from streams import Streams
+            streams = Streams(random.randrange(0, 2**31), self.streams)
+        if self.analytic:
+            # falls back to the batched engine for players with longer memory
+            from analytic import AnalyticPrisonersDilemmaTournament
+            return AnalyticPrisonersDilemmaTournament(players,
+                self.parallelism, self.coopcoop, self.coopdef, self.defdef,
+                self.defcoop, self.matches, self.rounds,
+                pairings[self.pairing](), streams=streams,
+                cache=self.makeCache(genomes=True))
+        if self.batched and self.parallelism > 0:
+            # worker processes share the arrays of the population
+            from shared import SharedBatchPrisonersDilemmaTournament
+            return SharedBatchPrisonersDilemmaTournament(players,
+                self.parallelism, self.coopcoop, self.coopdef, self.defdef,
+                self.defcoop, self.matches, self.rounds,
+                pairings[self.pairing](), streams=streams)
+        if self.batched:
+            # the batched engine needs numpy, so it is only imported on demand
+            from engine import BatchPrisonersDilemmaTournament
+            return BatchPrisonersDilemmaTournament(players, self.parallelism,
+                self.coopcoop, self.coopdef, self.defdef, self.defcoop,
+                self.matches, self.rounds, pairings[self.pairing](),
+                streams=streams)
+        if self.racing:
+            from tournament import RacingPrisonersDilemmaTournament
+            return RacingPrisonersDilemmaTournament(players,
+                self.parallelism, self.coopcoop, self.coopdef, self.defdef,
+                self.defcoop, self.matches, self.rounds, self.numToEvolve,
+                self.racingConfidence, self.racingMinRounds, streams)
+        from tournament import PrisonersDilemmaTournament
+        return PrisonersDilemmaTournament(players, self.parallelism,
+            self.coopcoop, self.coopdef, self.defdef, self.defcoop,
+            self.matches, self.rounds, pairings[self.pairing](), streams)
+
+    """ the outcome cache of the run, made on first use: a GenomeCache of
+    genomeCacheSize genomes when tournaments score genomes against each
+    other with array operations, an LRUCache of cacheSize pairs otherwise """
+    def makeCache(self, genomes):
+        if self.cache is not None:
+            return self.cache
+        if genomes:
+            if self.cacheSize > 0:
+                raise ValueError("cacheSize counts pairs of allocations; "
+                                 "batched Blotto and analytic scoring use "
+                                 "genomeCacheSize")
+            if self.genomeCacheSize > 0:
+                from genomecache import GenomeCache
+                self.cache = GenomeCache(self.genomeCacheSize)
+        elif self.cacheSize > 0:
+            from cache import LRUCache
+            self.cache = LRUCache(self.cacheSize)
+        return self.cache
+
+    """ packs the first generation into a Population when running compact """
+    def makePopulation(self, players):
+        if self.compact:
+            from population import Population
+            return Population.fromPlayers(players)
+        return players
+
+    """ streams a scored generation, and the name of the evolution operator
+    that produced it, to the results directory and the listener, prints its
+    best strategy and statistics, and keeps its best score, the weights of
+    its best player and the matches racing saved """
+    def record(self, generation, players, operator, tournament):
+        from stats import GenerationStats
+        if isinstance(players, list):
+            best = max(players, key=lambda p: p.score)
+            self.bestScores.append(best.score)
+        else:
+            best = players[players.ranking()[0]]
+            self.bestScores.append(float(best.score))
+        self.trackBest(best.weights)
+        stats = GenerationStats(generation, self.statsSample)
+        stats.addPlayers(players)
+        stats.addTournament(tournament)
+        self.sayBest(best.weights)
+        self.say(stats)
+        self.notify(generation, stats)
+        self.matchesPlayed += getattr(tournament, 'matchesPlayed', 0)
+        self.matchesSaved += getattr(tournament, 'matchesSaved', 0)
+        if self.writer is not None:
+            self.writer.write(generation, players, operator)
+
+    # prints the strategy of the best player of a scored generation, the
+    # way each game reads it
+    def sayBest(self, weights):
+        if self.game == 'simple':
+            self.say("Best Strategy: ")
+            self.calcCoopDef(weights)
+        elif self.game == 'blotto':
+            self.say("Best Strategy: ", sorted(weights))
+        else:
+            self.say("Best Strategy: ", weights)
+
+    """ gives the listener, if any, the summary of the generation just
+    scored: its best score and weights, the statistics of stats (see
+    stats.py) and how long it took """
+    def notify(self, generation, stats):
+        if self.listener is None:
+            return
+        seconds = time.time() - self.generationStart
+        summary = {'generation': generation,
+                   'bestScore': float(self.bestScores[-1]),
+                   'bestWeights': self.bestWeights,
+                   'seconds': seconds,
+                   'playersPerSec': stats.scores.count / max(seconds, 1e-9)}
+        summary.update(stats.summary())
+        self.listener(summary)
+
+    # keeps the weights of the best player, and whether they moved
+    def trackBest(self, weights):
+        weights = [float(w) for w in weights]
+        if self.convergence is not None:
+            self.moved = self.bestWeights is None or \
+                len(weights) != len(self.bestWeights) or \
+                max(abs(w1 - w2) for w1, w2 in
+                    zip(weights, self.bestWeights)) > self.convergence
+        self.bestWeights = weights
+
+    """ returns the players, first generation and operator to start from:
+    the given ones, or the ones of the checkpoint being resumed """
+    def startingPoint(self, players, operator):
+        if self.restored is None:
+            return players, 0, operator
+        self.say("Resuming at generation", self.restored.generation)
+        return self.restored.restore(), self.restored.generation, \
+            self.restored.operator
+
+    """ checkpoints the run every checkpointEvery generations, before playing
+    generation """
+    def saveCheckpoint(self, generation, players, operator):
+        if self.checkpoint is not None and \
+                generation % self.checkpointEvery == 0:
+            from checkpoint import saveCheckpoint
+            config = dict((name, getattr(self, name)) for name in CONFIG)
+            saveCheckpoint(self.checkpoint, generation, players, operator,
+                           config)
+
+    """ starts measuring a generation, when instrumented """
+    def startGeneration(self, generation):
+        self.generationStart = time.time()
+        if self.instruments is not None:
+            self.instruments.startGeneration(generation)
+
+    """ prints what the generation spent its time on, when instrumented """
+    def finishGeneration(self):
+        if self.instruments is not None:
+            self.instruments.endGeneration()
+
+    """ true once the best strategy stopped moving for patience generations,
+    when the run stops at convergence """
+    def converged(self, generation):
+        if self.convergence is None:
+            return False
+        self.stable = 0 if self.moved else self.stable + 1
+        if self.stable < self.patience:
+            return False
+        self.say("Converged after generation", generation, "saving",
+                 self.generations - generation - 1, "of", self.generations,
+                 "generations")
+        return True
+
+    # the result of a run that ended with players
+    def result(self, players):
+        if self.racing:
+            self.say("Racing played", self.matchesPlayed, "matches and saved",
+                     self.matchesSaved)
+        if self.cache is not None:
+            self.say("Outcome cache:", self.cache)
+        return {'players': players, 'bestScores': self.bestScores,
+                'bestWeights': self.bestWeights,
+                'generationsRun': len(self.bestScores),
+                'matchesPlayed': self.matchesPlayed,
+                'matchesSaved': self.matchesSaved}
+
+    """ runs the genetic algorithm on the islands, each evolving its own
+    population in its own process and sending its best players to its
+    neighbors every migrationInterval generations """
+    def runIslandModel(self, playerType, evolv, memory=1):
+        from islands import runIslands
+        def makePlayers():
+            return self.makePopulation([playerType(memory)
+                                        for i in range(self.numPlayers)])
+        def makeEvolution(players, generation):
+            return evolv(players, self.numToEvolve, self.numClones,
+                         playerType, memory, self.makeSelection())
+
+        results = runIslands(self.islands, makePlayers, self.makeTournament,
+            makeEvolution, self.generations, self.migrationInterval,
+            self.numMigrants, self.topology, self.seed)
+        for i, (players, bestScores, bestWeights) in enumerate(results):
+            self.say("########### Island", i)
+            self.say("Best score by generation: ", bestScores)
+            self.sayBest(bestWeights)
+        return {'islands': [{'players': players, 'bestScores': bestScores,
+                             'bestWeights': bestWeights}
+                            for players, bestScores, bestWeights in results]}
+
+    """ running genetic algorithm for SimplePlayer """
+    def runSimple(self, evol):
+        from player import SimplePlayer
+        """ determining evolution type based on argument """
+        evolv = self.evolutionType(evol)
+        if self.islands > 0:
+            return self.runIslandModel(SimplePlayer, evolv)
+
+        players = []
+        for i in range(self.numPlayers):
+            players.append(SimplePlayer())
+        players = self.makePopulation(players)
+
+        """ run all generations of tournament """
+        operator = 'random' # the first generation is random
+        players, start, operator = self.startingPoint(players, operator)
+        for i in range(start, self.generations):
+            self.say("########### Generation", i, " started")
+            self.startGeneration(i)
+            tournament = self.makeTournament(players)
+            tournament.runTournament()
+            self.record(i, players, operator, tournament)
+            evolution = evolv(players, self.numToEvolve, self.numClones,
+                              SimplePlayer, 1, self.makeSelection())
+            players = evolution.evolve()
+            operator = evolution.__class__.__name__
+            self.finishGeneration()
+            self.saveCheckpoint(i + 1, players, operator)
+            if self.converged(i):
+                break
+
+        self.say("The simple approach only looks at the last move. ")
+        self.say("We print out the probability ")
+        self.say("that we cooperate given that the opponent just cooperated "
+                 "and the ")
+        self.say("probability that we cooperate given that the opponent just "
+                 "defected")
+        return self.result(players)
+
+    # the player type with a memory of several moves
+    def memoryType(self):
+        from player import NMovePlayer, LookupPlayer
+        if self.lookup:
+            return LookupPlayer
+        return NMovePlayer
+
+    """ running genetic algorithm for NMovesPlayer """
+    def runNMoves(self, evol):
+        NMovePlayer = self.memoryType()
+        evolv = self.evolutionType(evol)
+        memory = self.memory
+        if self.islands > 0:
+            return self.runIslandModel(NMovePlayer, evolv, memory)
+
+        players = []
+        for i in range(self.numPlayers):
+            players.append(NMovePlayer(memory))
+        players = self.makePopulation(players)
+
+        operator = 'random' # the first generation is random
+        players, start, operator = self.startingPoint(players, operator)
+        for i in range(start, self.generations):
+            self.say("########### Generation", i, " started")
+            self.startGeneration(i)
+            tournament = self.makeTournament(players)
+            tournament.runTournament()
+            self.record(i, players, operator, tournament)
+            evolution = evolv(players, self.numToEvolve, self.numClones,
+                              NMovePlayer, memory, self.makeSelection())
+            players = evolution.evolve()
+            operator = evolution.__class__.__name__
+            self.finishGeneration()
+            self.saveCheckpoint(i + 1, players, operator)
+            if self.converged(i):
+                break
+
+        self.say("The NMoves approach looks at the opponent's overall "
+                 "cooperation ")
+        self.say("percentage and the last n moves (here, by default, n = 4). "
+                 "This ")
+        self.say("strategy prints out the coefficients of our strategy. The "
+                 "first ")
+        self.say("coefficient is the overall cooperation probability, the "
+                 "second is ")
+        self.say("a constant, and 3rd to 6th represent the four moves. In "
+                 "general, ")
+        self.say("a positive coefficient means that we are more likely ")
+        self.say("to cooperate based on that variable while a negative means ")
+        self.say("we are more likely to defect.")
+        return self.result(players)
+
+    """ runs genetic algorithm with half NMovePlayer's and half
+    SimplePlayer's """
+    def runMixed(self):
+        from player import SimplePlayer
+        from evolution import SimpleEvolution
+        NMovePlayer = self.memoryType()
+        memory = self.memory
+        players = []
+        for i in range(self.numPlayers/2):
+            players.append(NMovePlayer(memory))
+            players.append(SimplePlayer())
+        players = self.makePopulation(players)
+
+        operator = 'random' # the first generation is random
+        players, start, operator = self.startingPoint(players, operator)
+        for i in range(start, self.generations):
+            self.say("########### Generation", i, " started")
+            self.startGeneration(i)
+            tournament = self.makeTournament(players)
+            tournament.runTournament()
+            self.record(i, players, operator, tournament)
+            """ alternating generations, add SimplePlayer and NMovePlayer to
+                fill the rest of the players for the next generation """
+            if i % 2 == 0:
+                evolution = SimpleEvolution(players, self.numToEvolve,
+                    self.numClones, NMovePlayer, memory, self.makeSelection())
+            else:
+                evolution = SimpleEvolution(players, self.numToEvolve,
+                    self.numClones, SimplePlayer, 1, self.makeSelection())
+            players = evolution.evolve()
+            operator = evolution.__class__.__name__
+            self.finishGeneration()
+            self.saveCheckpoint(i + 1, players, operator)
+            if self.converged(i):
+                break
+
+        if self.bestWeights is None: # no generation ran
+            pass
+        elif len(self.bestWeights) == 3:
+            self.calcCoopDef(self.bestWeights)
+            self.say("On this run, a player with 1-move memory was best")
+        else:
+            self.say("On this run, a player with multiple-move memory was "
+                     "best")
+
+        self.say("A mixed approach seeing if players of longer memory are "
+                 "better")
+        self.say("than those with shorter memory. The convergent strategy at "
+                 "the")
+        self.say("end will give us a good idea of this.")
+        return self.result(players)
+
+    """ runs a spatial population: the players live on a graph, play their
+    neighbors and adopt the strategy of their best neighbor. Parts of the
+    graph run in parallelism worker processes, if set. """
+    def runSpatial(self):
+        import numpy as np
+        from player import SimplePlayer, BlottoPlayer
+        from population import Population, randomGenomes
+        from spatial import graphs, SpatialPopulation, SimpleGame, BlottoGame
+        from stats import GenerationStats
+        if self.checkpoint is not None or self.restored is not None:
+            raise ValueError("spatial runs can't be checkpointed")
+        if self.graph not in graphs:
+            raise ValueError("unknown graph " + str(self.graph))
+        if self.game == 'simple':
+            playerType, numMoves = SimplePlayer, 1
+            game = SimpleGame(self.coopcoop, self.coopdef, self.defdef,
+                              self.defcoop, self.matches)
+        elif self.game == 'blotto':
+            playerType, numMoves = BlottoPlayer, 10
+            game = BlottoGame()
+        else:
+            raise ValueError("spatial populations play simple or blotto, "
+                             "not " + str(self.game))
+
+        graph = graphs[self.graph](self.numPlayers, self.degree,
+                                   self.rewiring)
+        self.say("Playing on a", self.graph, "graph of", len(graph),
+                 "players and", graph.numLinks(), "links")
+        population = SpatialPopulation(graph,
+            randomGenomes(playerType, len(graph), numMoves), game,
+            max(1, self.parallelism), self.parallelism > 0, self.mutation,
+            random.randrange(0, 2**31), self.statsSample)
+        try:
+            for i in range(self.generations):
+                self.say("########### Generation", i, " started")
+                self.startGeneration(i)
+                summary = population.step(i)
+                self.bestScores.append(summary['bestScore'])
+                self.trackBest(summary['bestGenome'])
+                stats = GenerationStats(i, self.statsSample)
+                stats.addSummary(summary['scores'], summary['sketch'])
+                self.sayBest(self.bestWeights)
+                self.say(stats)
+                self.say("Adopted by", summary['adopted'], "players")
+                self.notify(i, stats)
+                self.finishGeneration()
+                if self.converged(i):
+                    break
+            genomes, scores = population.state()
+        finally:
+            population.close()
+        players = Population(genomes, np.zeros(len(genomes), dtype=np.int8),
+                             [(playerType, numMoves)], scores)
+        return self.result(players)
+
+    """ runs Blotto tournament """
+    def runBlotto(self):
+        from player import BlottoPlayer
+        from tournament import BlottoTournament
+        from evolution import BlottoEvolution
+        from pairing import pairings
+        players = []
+        for i in range(self.numPlayers):
+            players.append(BlottoPlayer())
+        players = self.makePopulation(players)
+
+        operator = 'random' # the first generation is random
+        players, start, operator = self.startingPoint(players, operator)
+        for i in range(start, self.generations):
+            self.say("########### Generation", i, " started")
+            self.startGeneration(i)
+            if self.batched:
+                from engine import BatchBlottoTournament
+                tournament = BatchBlottoTournament(players, self.parallelism,
+                    self.matches, self.rounds, 10, 100,
+                    cache=self.makeCache(genomes=True))
+            else:
+                tournament = BlottoTournament(players, self.parallelism,
+                    self.matches, self.rounds, 10, 100,
+                    pairings[self.pairing](), self.makeCache(genomes=False))
+            tournament.runTournament()
+            self.record(i, players, operator, tournament)
+            evolution = BlottoEvolution(players, self.numToEvolve,
+                self.numClones, 10, self.makeSelection())
+            players = evolution.evolve()
+            operator = evolution.__class__.__name__
+            self.finishGeneration()
+            self.saveCheckpoint(i + 1, players, operator)
+            if self.converged(i):
+                break
+
+        return self.result(players)
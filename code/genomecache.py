@@ -0,0 +1,151 @@
+import numpy as np
+
+"""A store of pairwise outcomes keyed on genomes, for games where the
+outcome of a pair only depends on the two genomes: Blotto, and the expected
+payoffs of SimplePlayers. Clones often keep their parent's genome (a Blotto
+transfer of 0 soldiers, a SimplePlayer perturbed in its unused weight), so
+many pairs of a generation were already played in earlier generations.
+
+The store keeps the outcomes among at most capacity genomes in a
+(capacity, capacity) array, with a slot per genome, keyed on the bytes of
+the genome. For each tournament, identical genomes are merged, and only the
+outcomes of pairs that were never computed are computed, in blocks of rows
+like the tournaments without a store compute them: the new genomes against
+all of the tournament's, and the pairs of known genomes that never met. A
+tournament with more distinct genomes than the store holds is computed in
+blocks too, without the store, so its memory stays that of one block. When
+slots run out, the genomes that went unused for the most tournaments are
+evicted. A store holds outcomes of one game with one set of settings; a run
+whose settings change needs a new one.
+
+The arrays are allocated up front and take 9 * capacity**2 bytes, so the
+capacity is bounded by MAX_GENOMES (about 150MB). A capacity of a few times
+the number of players is enough to keep the genomes of recent generations."""
+
+# most genomes a store can keep
+MAX_GENOMES = 4096
+
+"""The distinct rows of genomes, as (distinct, inverse, counts): inverse[i]
+is the distinct row of row i and counts[a] the number of rows equal to
+distinct[a]"""
+def distinctRows(genomes):
+    genomes = np.ascontiguousarray(genomes)
+    rows = genomes.view(np.dtype((np.void, genomes.dtype.itemsize *
+                                  genomes.shape[1]))).ravel()
+    unique, first, inverse, counts = np.unique(rows, return_index=True,
+                                               return_inverse=True,
+                                               return_counts=True)
+    return genomes[first], inverse, counts
+
+class GenomeCache(object):
+    def __init__(self, capacity):
+        if capacity > MAX_GENOMES:
+            raise ValueError("a genome cache keeps at most %d genomes, not %d"
+                             % (MAX_GENOMES, capacity))
+        self.capacity = capacity # maximum number of genomes kept
+        self.slots = {} # genome bytes -> slot
+        self.keys = [None] * capacity # genome bytes in each slot
+        # outcomes[a, b] is the outcome of the genome in slot a against the
+        # one in slot b, valid where known[a, b]
+        self.outcomes = np.zeros((capacity, capacity))
+        self.known = np.zeros((capacity, capacity), dtype=bool)
+        self.lastUsed = np.zeros(capacity, dtype=int) # tournament of last use
+        self.tournaments = 0
+        self.reused = 0 # pairs whose outcome came from the store
+        self.computed = 0 # pairs whose outcome was computed
+
+    """The outcomes among distinct genomes, at most capacity of them, as a
+    matrix whose [a, b] is the outcome of distinct[a] against distinct[b].
+    blocks(first, second) yields the outcomes of the genomes of first
+    against those of second in blocks of (row indices, outcomes of those
+    rows against every genome of second), like castlesWonBlocks."""
+    def matrix(self, distinct, blocks):
+        self.tournaments += 1
+        keys = [row.tobytes() for row in distinct]
+        isNew = np.array([key not in self.slots for key in keys], dtype=bool)
+        # the known genomes of this tournament can't be evicted for the new
+        self.lastUsed[[self.slots[key] for key, new in zip(keys, isNew)
+                       if not new]] = self.tournaments
+        self.assign([key for key, new in zip(keys, isNew) if new])
+        slots = np.array([self.slots[key] for key in keys])
+        self.lastUsed[slots] = self.tournaments
+
+        new = np.flatnonzero(isNew)
+        old = np.flatnonzero(~isNew)
+        if len(new) > 0:
+            # the new genomes against everyone, and everyone else against
+            # the new genomes
+            self.store(slots[new], slots, blocks(distinct[new], distinct))
+            if len(old) > 0:
+                self.store(slots[old], slots[new],
+                           blocks(distinct[old], distinct[new]))
+        if len(old) > 0:
+            # known genomes that never met in the same tournament
+            missing = ~self.known[np.ix_(slots[old], slots[old])]
+            rows = old[missing.any(axis=1)]
+            if len(rows) > 0:
+                self.store(slots[rows], slots[old],
+                           blocks(distinct[rows], distinct[old]))
+        matrix = self.outcomes[np.ix_(slots, slots)]
+        self.reused += len(slots) ** 2
+        return matrix
+
+    """The sum of the outcomes of each row of genomes against all the other
+    rows, as the tournaments that play everyone against everyone score
+    them. blocks computes outcomes, as for matrix."""
+    def totals(self, genomes, blocks):
+        distinct, inverse, counts = distinctRows(genomes)
+        if len(distinct) <= self.capacity:
+            matrix = self.matrix(distinct, blocks)
+            return (matrix.dot(counts) - matrix.diagonal())[inverse]
+        # too many genomes to keep: computes everything, a block at a time
+        totals = np.zeros(len(distinct))
+        for rows, block in blocks(distinct, distinct):
+            totals[rows] = block.dot(counts) - \
+                block[np.arange(len(rows)), rows]
+        self.computed += len(distinct) ** 2
+        return totals[inverse]
+
+    # gives slots to new genome keys, evicting the least recently used
+    # genomes if needed
+    def assign(self, keys):
+        if not keys:
+            return
+        free = [slot for slot in range(self.capacity)
+                if self.keys[slot] is None]
+        if len(free) < len(keys):
+            used = np.argsort(self.lastUsed, kind='mergesort')
+            used = [slot for slot in used if self.keys[slot] is not None and
+                    self.lastUsed[slot] < self.tournaments]
+            for slot in used[:len(keys) - len(free)]:
+                del self.slots[self.keys[slot]]
+                self.keys[slot] = None
+                free.append(slot)
+        for key, slot in zip(keys, free):
+            self.slots[key] = slot
+            self.keys[slot] = key
+            self.known[slot, :] = False
+            self.known[:, slot] = False
+
+    # stores the outcomes of the slots in rows against those in columns,
+    # given as the blocks of a blocks function
+    def store(self, rows, columns, outcomes):
+        for block, values in outcomes:
+            self.outcomes[np.ix_(rows[block], columns)] = values
+            self.known[np.ix_(rows[block], columns)] = True
+            self.computed += values.size
+            self.reused -= values.size
+
+    def __len__(self):
+        return len(self.slots)
+
+    # fraction of the pairs looked up whose outcome was reused
+    def hitRate(self):
+        pairs = self.reused + self.computed
+        if pairs == 0:
+            return 0.0
+        return float(self.reused) / pairs
+
+    def __str__(self):
+        return "%d pairs reused, %d computed (%.1f%% reused), %d genomes" % \
+            (self.reused, self.computed, 100 * self.hitRate(), len(self))
@@ -0,0 +1,165 @@
+import os
+import cProfile
+import timeit
+import player
+from tournament import *
+from evolution import *
+
+"""Opt-in instrumentation of the generation loop. Installing an Instruments
+wraps the methods of the tournaments and evolutions that make up a
+generation with counters and timers:
+
+    tournament  runTournament
+    pairing     createPairing
+    rounds      runRound and runRoundParallelism
+    matches     runSingleMatch (runMatches for Blotto, runBatchMatch for the
+                batched engine)
+    evolve      evolve
+
+Times are inclusive, so the rounds contain the pairing and the matches, and
+a method calling the same phase through super() is only timed once. Nothing
+is wrapped until install() is called, so a run without instruments pays
+nothing at all. Matches played in worker processes (--parallel, --islands)
+are not counted, only the time of the rounds that wait for them."""
+
+PHASES = ['tournament', 'pairing', 'rounds', 'matches', 'evolve']
+
+# counters of the wrapped methods: how many rounds or matches a call plays
+def _one(obj, args):
+    return 1
+
+def _numMatches(obj, args):
+    return obj.numMatches
+
+def _batchSize(obj, args):
+    return len(args[0])
+
+# the classes of a hierarchy, the root first
+def _classes(root):
+    classes = [root]
+    for subclass in root.__subclasses__():
+        classes.extend(_classes(subclass))
+    return classes
+
+class Instruments(object):
+    def __init__(self, profileDir=None, verbose=True):
+        self.profileDir = profileDir # cProfile dumps, one per generation
+        self.verbose = verbose # print a summary after every generation
+        self.summaries = [] # the summary of every finished generation
+        self.patched = [] # (class, method name, original method)
+        self.times = dict((phase, 0.0) for phase in PHASES)
+        self.counts = dict((phase, 0) for phase in PHASES)
+        self.depth = dict((phase, 0) for phase in PHASES)
+        self.generation = None
+        self.profile = None
+        if profileDir is not None and not os.path.isdir(profileDir):
+            os.makedirs(profileDir)
+
+    # (root class, method name, phase, counter) of every wrapped method,
+    # with the batched engine's when numpy is there. The modules of the
+    # numpy tournaments are imported here, since runs only import them when
+    # they first need them, and their classes must exist to be wrapped.
+    def methods(self):
+        methods = [(Tournament, 'runTournament', 'tournament', None),
+                   (Tournament, 'createPairing', 'pairing', None),
+                   (Tournament, 'runRound', 'rounds', _one),
+                   (Tournament, 'runRoundParallelism', 'rounds', _one),
+                   (PrisonersDilemmaTournament, 'runSingleMatch', 'matches',
+                    _one),
+                   (BlottoTournament, 'runMatches', 'matches', _numMatches),
+                   (Evolution, 'evolve', 'evolve', _one)]
+        try:
+            import analytic
+            import shared
+            from engine import BatchPrisonersDilemmaTournament
+            methods.append((BatchPrisonersDilemmaTournament, 'runBatchMatch',
+                            'matches', _batchSize))
+        except ImportError:
+            pass
+        return methods
+
+    """Wraps the methods of every tournament and evolution class"""
+    def install(self):
+        for root, name, phase, counter in self.methods():
+            for cls in _classes(root):
+                if name in cls.__dict__:
+                    self._wrap(cls, name, phase, counter)
+        return self
+
+    """Puts the original methods back"""
+    def uninstall(self):
+        for cls, name, original in reversed(self.patched):
+            setattr(cls, name, original)
+        self.patched = []
+
+    # replaces a method by one timing and counting its phase
+    def _wrap(self, cls, name, phase, counter):
+        original = cls.__dict__[name]
+        instruments = self
+        def wrapper(obj, *args):
+            # calls within the same phase are part of the outer call
+            if instruments.depth[phase]:
+                return original(obj, *args)
+            instruments.depth[phase] = 1
+            start = timeit.default_timer()
+            try:
+                return original(obj, *args)
+            finally:
+                instruments.times[phase] += timeit.default_timer() - start
+                instruments.depth[phase] = 0
+                if counter is not None:
+                    instruments.counts[phase] += counter(obj, args)
+        wrapper.__name__ = name
+        wrapper.__doc__ = original.__doc__
+        setattr(cls, name, wrapper)
+        self.patched.append((cls, name, original))
+
+    """Resets the counters and starts profiling a generation"""
+    def startGeneration(self, generation):
+        self.generation = generation
+        for phase in PHASES:
+            self.times[phase] = 0.0
+            self.counts[phase] = 0
+        self.firstId = player.nextId
+        if self.profileDir is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.start = timeit.default_timer()
+
+    """Ends the generation started last, and returns and prints its
+    summary"""
+    def endGeneration(self):
+        seconds = timeit.default_timer() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(os.path.join(self.profileDir,
+                'gen_%06d.prof' % self.generation))
+            self.profile = None
+
+        summary = {'generation': self.generation, 'seconds': seconds,
+                   'rounds': self.counts['rounds'],
+                   'matches': self.counts['matches'],
+                   # every match is a move of each player
+                   'moves': 2 * self.counts['matches'],
+                   # players, or rows of compact populations, created
+                   'newPlayers': player.nextId - self.firstId}
+        for phase in PHASES:
+            summary[phase + 'Seconds'] = self.times[phase]
+        summary['movesPerSec'] = 0.0
+        if self.times['matches'] > 0:
+            summary['movesPerSec'] = summary['moves'] / self.times['matches']
+        self.summaries.append(summary)
+        if self.verbose:
+            print self.format(summary)
+        return summary
+
+    # one line describing a summary
+    def format(self, summary):
+        return ("Generation %d: %.3fs, tournament %.3fs (pairing %.3fs, "
+                "rounds %.3fs, matches %.3fs), evolve %.3fs; %d rounds, "
+                "%d matches, %.0f moves/s, %d new players") % (
+            summary['generation'], summary['seconds'],
+            summary['tournamentSeconds'], summary['pairingSeconds'],
+            summary['roundsSeconds'], summary['matchesSeconds'],
+            summary['evolveSeconds'], summary['rounds'], summary['matches'],
+            summary['movesPerSec'], summary['newPlayers'])
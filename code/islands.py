@@ -0,0 +1,195 @@
+import Queue
+import random
+import traceback
+import multiprocessing
+import player
+
+"""The island model. Several populations (islands) evolve at the same time,
+each in its own worker process with its own tournaments and evolution, and
+every few generations each island sends copies of its best players to its
+neighbors, where they replace the worst players. Islands only wait for the
+migrants of their neighbors, never for a global barrier.
+
+Islands are started by forking, so the functions that create the players,
+tournaments and evolutions of an island don't need to be picklable."""
+
+"""Raised when an island fails, with the error of its process"""
+class IslandError(Exception):
+    pass
+
+# ids of island i start at i * ISLAND_IDS, so they are unique across islands
+ISLAND_IDS = 10**12
+
+"""The islands that island index sends its migrants to: the next one on a
+ring, or all the others"""
+def neighbors(index, count, topology):
+    if count == 1:
+        return []
+    if topology == 'ring':
+        return [(index + 1) % count]
+    if topology == 'full':
+        return [i for i in range(count) if i != index]
+    raise ValueError("unknown topology " + topology)
+
+# indices of the players sorted by decreasing score
+def ranking(players):
+    if isinstance(players, list):
+        return sorted(range(len(players)), key=lambda i: -players[i].score)
+    return players.ranking().tolist()
+
+# the players at the given indices, as a list or a Population
+def pick(players, indices):
+    if isinstance(players, list):
+        return [players[i] for i in indices]
+    return players.subset(indices)
+
+"""Replaces the worst players by the immigrants and returns the players"""
+def replaceWorst(players, immigrants):
+    keep = sorted(ranking(players)[:len(players) - len(immigrants)])
+    if isinstance(players, list):
+        return pick(players, keep) + immigrants
+    from population import Population
+    return Population.concat([pick(players, keep), immigrants])
+
+"""One island: a population with its inbox and the inboxes of its
+neighbors"""
+class Island(object):
+    def __init__(self, index, players, inbox, outboxes, numSources,
+                 numMigrants):
+        self.index = index
+        self.players = players
+        self.inbox = inbox # queue receiving the migrants of other islands
+        self.outboxes = outboxes # inboxes of the islands to send to
+        self.numSources = numSources # islands sending to this one
+        self.numMigrants = numMigrants # players sent to each neighbor
+        # migrants that arrived for later generations
+        self.pending = {}
+
+    """Sends the best players to the neighbors and takes in theirs. Migrants
+    from faster islands may already be waiting for a later generation, so
+    they are kept until that generation."""
+    def migrate(self, generation):
+        best = ranking(self.players)[:self.numMigrants]
+        emigrants = pick(self.players, best)
+        for outbox in self.outboxes:
+            outbox.put((generation, self.index, emigrants))
+
+        arrivals = self.pending.pop(generation, [])
+        while len(arrivals) < self.numSources:
+            sent, source, migrants = self.inbox.get()
+            if sent == generation:
+                arrivals.append((source, migrants))
+            else:
+                self.pending.setdefault(sent, []).append((source, migrants))
+        if not arrivals:
+            return
+
+        # the order of arrival doesn't matter, only the source islands
+        arrivals.sort(key=lambda arrival: arrival[0])
+        if isinstance(self.players, list):
+            immigrants = sum([migrants for source, migrants in arrivals], [])
+        else:
+            from population import Population
+            immigrants = Population.concat([m for s, m in arrivals])
+        self.players = replaceWorst(self.players, immigrants)
+
+# runs an island in a worker process and puts its final players, the best
+# score of each generation and the weights of the last generation's best
+# player in the results queue, or the traceback of the error that stopped it
+def _runIsland(island, makePlayers, makeTournament, makeEvolution,
+               generations, interval, seed, results):
+    try:
+        bestScores, bestWeights = _evolveIsland(island, makePlayers,
+            makeTournament, makeEvolution, generations, interval, seed)
+    except Exception:
+        results.put((island.index, None, None, None, traceback.format_exc()))
+        return
+    results.put((island.index, island.players, bestScores, bestWeights, None))
+
+# evolves the players of an island and returns the best score of each
+# generation and the weights of the best player of the last one, taken
+# after its tournament and before it evolves
+def _evolveIsland(island, makePlayers, makeTournament, makeEvolution,
+                  generations, interval, seed):
+    player.nextId = island.index * ISLAND_IDS
+    # forked islands start with the same random state, so each one is
+    # seeded again: from seed if given, from the system otherwise
+    if seed is not None:
+        seed += island.index
+    random.seed(seed)
+    try:
+        import numpy
+        numpy.random.seed(seed)
+    except ImportError:
+        pass
+
+    island.players = makePlayers()
+    bestScores = []
+    bestWeights = None
+    for i in range(generations):
+        tournament = makeTournament(island.players)
+        tournament.runTournament()
+        best = island.players[ranking(island.players)[0]]
+        bestScores.append(best.score)
+        bestWeights = [float(w) for w in best.weights]
+        if interval > 0 and (i + 1) % interval == 0:
+            island.migrate(i)
+        island.players = makeEvolution(island.players, i).evolve()
+    return bestScores, bestWeights
+
+"""Runs count islands for a number of generations, each in its own process.
+makePlayers() creates the first generation of an island,
+makeTournament(players) and makeEvolution(players, generation) the
+tournament and evolution of a generation. Every interval generations (0 for
+never) each island sends numMigrants players to its neighbors in the
+topology ('ring' or 'full'). Returns, for every island in order, its final
+players, the best score of each of its generations and the weights of the
+best player of its last generation. Raises an
+IslandError if an island raises or its process dies."""
+def runIslands(count, makePlayers, makeTournament, makeEvolution, generations,
+               interval=5, numMigrants=5, topology='ring', seed=None):
+    inboxes = [multiprocessing.Queue() for i in range(count)]
+    sources = [0] * count
+    for i in range(count):
+        for j in neighbors(i, count, topology):
+            sources[j] += 1
+
+    results = multiprocessing.Queue()
+    processes = []
+    for i in range(count):
+        outboxes = [inboxes[j] for j in neighbors(i, count, topology)]
+        island = Island(i, None, inboxes[i], outboxes, sources[i],
+                        numMigrants)
+        process = multiprocessing.Process(target=_runIsland,
+            args=(island, makePlayers, makeTournament, makeEvolution,
+                  generations, interval, seed, results))
+        process.start()
+        processes.append(process)
+
+    # results must be read before joining, or large ones block the workers
+    finished = {}
+    try:
+        while len(finished) < count:
+            try:
+                index, players, bestScores, bestWeights, error = \
+                    results.get(timeout=1.0)
+            except Queue.Empty:
+                # an island that returned has put its result, so only one
+                # that died without returning never will
+                for i, process in enumerate(processes):
+                    if i not in finished and process.exitcode not in \
+                            [None, 0]:
+                        raise IslandError("island %d died with exit code %d"
+                                          % (i, process.exitcode))
+                continue
+            if error is not None:
+                raise IslandError("island %d failed:\n%s" % (index, error))
+            finished[index] = (players, bestScores, bestWeights)
+    except BaseException:
+        # the other islands may be waiting for the failed one's migrants
+        for process in processes:
+            process.terminate()
+        raise
+    for process in processes:
+        process.join()
+    return [finished[i] for i in range(count)]
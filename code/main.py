@@ -1,188 +1,102 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from evolution import *
-from player import *
-from tournament import *
-import math
+import argparse
 import sys
 
-numPlayers = 300 # total number of players at each generation
-generations = 100 # how many times do we evolve?
-matches = 10 # how many rounds in a generation of a tournament?
-rounds = 20 # number of times players play each other in a match
-numToEvolve = 48 # how many of the best players should go to next generation
-numClones = 6 # number of (mutated) clones in next generation
-
-# parameters
-coopcoop = 4 # payoff if both cooperate
-coopdef = 0 # payoff to Player 1 if he cooperates and Player 2 defects
-defdef = 1 # payoff if both defect
-defcoop = 5 # payoff to Player 1 if he defects and Player 2 cooperates
-
-MOVE_MEMORY = 4
-
-# map from evolution string to class type
-evol = {
-       'simpleevol':SimpleEvolution,
-       'simplesex':SimpleSex,
-       'complex':ComplexSex,
-       }
-
-"""For 1-move memory players, calculates probabilities given the log odds
-formula shown in the specs."""
-def calcCoopDef(player):
-    val = math.exp(player.weights[1] + player.weights[2])
-    print "P(cooperate|defect) = ", (math.exp(player.weights[1]) / \
-      (1 + math.exp(player.weights[1])))
-    print "P(cooperate|cooperate) = ", (val / (1 + val))
-
-print "This simulation prints out the best strategy at each generation"
-
-""" running genetic algorithm for SimplePlayer """
-def runSimple(evolType='simpleevol'):
-    """ determining evolution type based on argument """
-    try:
-        evolv = evol[evolType]
-    except KeyError:
-        print "invalid evolution type. defaulting to SimpleEvolution"
-        evolv = evol['simpleevol'] 
-    print "Using Evolution type", evolv.__name__
-
-    players = []
-    for i in range(numPlayers):
-        players.append(SimplePlayer())
-
-    """ run all generations of tournament """
-    for i in range(generations):
-        print "########### Generation", i," started"
-        print "Best Strategy: "
-        calcCoopDef(players[0])
-        tournament = PrisonersDilemmaTournament(players, 0, coopcoop, coopdef,\
-            defdef, defcoop, matches, rounds)
-        tournament.runTournament()
-        evolution = evolv(players, numToEvolve, numClones, SimplePlayer)
-        players = evolution.evolve()
-        
-    print "The simple approach only looks at the last move. "
-    print "We print out the probability "
-    print "that we cooperate given that the opponent just cooperated and the "
-    print "probability that we cooperate given that the opponent just defected"
-
-""" running genetic algorithm for NMovesPlayer """
-def runNMoves(evolType='simpleevol', memory=MOVE_MEMORY):
-    try:
-        evolv = evol[evolType]
-    except KeyError:
-        print "invalid evolution type. defaulting to SimpleEvolution"
-        evolv = evol['simpleevol']
-    print "Using Evolution type", evolv.__name__
-
-    players = []
-    for i in range(numPlayers):
-        players.append(NMovePlayer(memory))
-
-    for i in range(generations):
-        print "########### Generation", i," started"
-        print "Best Strategy: ", players[0].weights
-        tournament = PrisonersDilemmaTournament(players, 0, coopcoop, coopdef,\
-            defdef, defcoop, matches, rounds)
-        tournament.runTournament()
-        evolution = evolv(players, numToEvolve, numClones, NMovePlayer, memory)
-        players = evolution.evolve()
-
-    print "The NMoves approach looks at the opponent's overall cooperation "
-    print "percentage and the last n moves (here, by default, n = 4). This "
-    print "strategy prints out the coefficients of our strategy. The first "
-    print "coefficient is the overall cooperation probability, the second is "
-    print "a constant, and 3rd to 6th represent the four moves. In general, "
-    print "a positive coefficient means that we are more likely "
-    print "to cooperate based on that variable while a negative means "
-    print "we are more likely to defect."
-
-""" runs genetic algorithm with half NMovePlayer's and half SimplePlayer's """
-def runMixed(evolType='simpleevol', memory=MOVE_MEMORY):
-    players = []
-    for i in range(numPlayers/2):
-        players.append(NMovePlayer(memory))
-        players.append(SimplePlayer())
-
-    for i in range(generations):
-        print "########### Generation", i," started"
-        print "Best Strategy: ", players[0].weights
-        tournament = PrisonersDilemmaTournament(players, 0, coopcoop, coopdef,\
-            defdef, defcoop, matches, rounds)
-        tournament.runTournament()
-        """ alternating generations, add SimplePlayer and NMovePlayer to
-            fill the rest of the players for the next generation """
-        if i % 2 == 0:
-            evolution = SimpleEvolution(players, numToEvolve, numClones,\
-                NMovePlayer, memory)
-        else:
-            evolution = SimpleEvolution(players, numToEvolve, numClones,\
-                SimplePlayer)
-        players = evolution.evolve()
-
-    if len(players[0].weights) == 3:
-        calcCoopDef(players[0])
-        print "On this run, a player with 1-move memory was best"
-    else:
-        print "On this run, a player with multiple-move memory was best"
-        
-    print "A mixed approach seeing if players of longer memory are better"
-    print "than those with shorter memory. The convergent strategy at the"
-    print "end will give us a good idea of this."
-
-""" runs Blotto tournament """
-def runBlotto():
-    players = []
-    for i in range(numPlayers):
-        players.append(BlottoPlayer())
-
-    for i in range(generations):
-        print "########### Generation", i," started"
-        print "Best Strategy: ", sorted(players[0].weights)
-        tournament = BlottoTournament(players, 0, matches, rounds, 10, 100)
-        tournament.runTournament()
-        evolution = BlottoEvolution(players, numToEvolve, numClones, 10)
-        players = evolution.evolve()
-
-""" if passed in, sets payoffs """
-if (len(sys.argv) == 7):
-    coopcoop = int(sys.argv[3])
-    coopdef = int(sys.argv[4])
-    defdef = int(sys.argv[5])
-    defcoop = int(sys.argv[6])
-
-if (len(sys.argv) == 6):
-    coopcoop = int(sys.argv[2])
-    coopdef = int(sys.argv[3])
-    defdef = int(sys.argv[4])
-    defcoop = int(sys.argv[5])
-
-print "Using payoffs ", coopcoop, " ", coopdef, " ", defdef, " ", defcoop
-
-if (len(sys.argv) < 2):
-    print "you must specify game/player type"
-    exit(0)
-
-if (sys.argv[1] == 'simple'):
-    if len(sys.argv) == 7 or len(sys.argv) == 3:
-        if sys.argv[2] != 'simpleevol':
-            numToEvolve = 20
-        runSimple(sys.argv[2])
-    else:
-        runSimple()
-elif (sys.argv[1] == 'nmoves'):
-    if len(sys.argv) == 7 or len(sys.argv) == 3:
-        if sys.argv[2] != 'simpleevol':
-            numToEvolve = 20
-        runNMoves(sys.argv[2])
-    else:
-        runNMoves()
-elif (sys.argv[1] == 'mixed'):
-    runMixed()
-elif (sys.argv[1] == 'blotto'):
-    runBlotto()
-else:
-    print "you entered an invalid game. look at README for possibilities"
+"""The command-line interface. It reads the game, the evolution type, the
+payoffs and the flags into the settings of experiment.py and runs the
+experiment with them, printing its progress:
+
+python main.py {player} [evoltype] [cc] [cd] [dd] [dc] [flags]
+
+See the README for the arguments and flags."""
+
+""" the command-line parser of the flags; positional arguments are read by
+hand, since flags can appear anywhere among them """
+def makeParser():
+    parser = argparse.ArgumentParser(
+        usage="python main.py {player} [evoltype] [cc] [cd] [dd] [dc] "
+              "[flags]")
+    parser.add_argument('--resume', metavar='FILE')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--checkpoint', metavar='FILE')
+    parser.add_argument('--checkpoint-every', dest='checkpointEvery',
+                        type=int, metavar='K')
+    parser.add_argument('--lookup', action='store_true', default=None)
+    parser.add_argument('--batch', dest='batched', action='store_true',
+                        default=None)
+    parser.add_argument('--analytic', action='store_true', default=None)
+    parser.add_argument('--compact', action='store_true', default=None)
+    parser.add_argument('--parallel', dest='parallelism', type=int,
+                        metavar='N')
+    parser.add_argument('--cache', dest='cacheSize', type=int, metavar='N')
+    parser.add_argument('--genome-cache', dest='genomeCacheSize', type=int,
+                        metavar='N')
+    parser.add_argument('--results', metavar='DIR')
+    parser.add_argument('--islands', type=int, metavar='K')
+    parser.add_argument('--migrate', nargs=2, type=int, metavar=('M', 'N'))
+    parser.add_argument('--topology')
+    parser.add_argument('--selection')
+    parser.add_argument('--pairing')
+    parser.add_argument('--streams', choices=['pair', 'common'])
+    parser.add_argument('--racing', action='store_true', default=None)
+    parser.add_argument('--racing-confidence', dest='racingConfidence',
+                        type=float, metavar='Z')
+    parser.add_argument('--converge', dest='convergence', type=float,
+                        metavar='TOL')
+    parser.add_argument('--patience', type=int, metavar='K')
+    parser.add_argument('--graph', choices=['grid', 'smallworld'])
+    parser.add_argument('--degree', type=int, metavar='K')
+    parser.add_argument('--rewiring', type=float, metavar='P')
+    parser.add_argument('--mutation', type=float, metavar='P')
+    parser.add_argument('--instrument', action='store_true', default=None)
+    parser.add_argument('--profile', metavar='DIR')
+    return parser
+
+""" the settings given on the command line, as a config for
+runExperiment """
+def parseArguments(argv):
+    parser = makeParser()
+    flags, positional = parser.parse_known_args(argv)
+    for arg in positional:
+        if arg.startswith('--'):
+            parser.error("unrecognized argument " + arg)
+
+    # flags that weren't given keep the default, or the setting of the
+    # checkpoint being resumed
+    config = dict((name, value) for name, value in vars(flags).items()
+                  if value is not None and name != 'migrate')
+    if flags.migrate is not None:
+        config['migrationInterval'], config['numMigrants'] = flags.migrate
+
+    if len(positional) > 0:
+        config['game'] = positional[0]
+    """ if passed in, sets payoffs """
+    if len(positional) in [5, 6]:
+        config['coopcoop'], config['coopdef'], config['defdef'], \
+            config['defcoop'] = [int(arg) for arg in positional[-4:]]
+    """ the evolution type only applies to 'simple' and 'nmoves' """
+    if len(positional) in [2, 6] and positional[0] in ['simple', 'nmoves']:
+        config['evolution'] = positional[1]
+    return config
+
+def main(argv):
+    from experiment import Experiment
+    config = parseArguments(argv)
+    config['verbose'] = True
+    experiment = Experiment(config)
+    print "This simulation prints out the best strategy at each generation"
+    print "Using payoffs ", experiment.coopcoop, " ", experiment.coopdef, \
+        " ", experiment.defdef, " ", experiment.defcoop
+    if 'game' not in config and 'resume' not in config:
+        print "you must specify game/player type"
+        return 0
+    if experiment.game not in ['simple', 'nmoves', 'mixed', 'blotto']:
+        print "you entered an invalid game. look at README for possibilities"
+        return 0
+    experiment.run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,80 @@
+import random
+
+"""Pairings decide who plays whom in every round of a tournament. A round is
+described by an order of player indices, where order[2i] plays order[2i+1];
+with an odd number of players the last index sits the round out. Schedules
+are computed once per tournament (so once per generation) as lists of
+indices, so rounds never copy or permute the list of players itself."""
+
+class Pairing(object):
+    def __init__(self):
+        self.orders = []
+        pass
+
+    """Precomputes the orders of all rounds of a tournament"""
+    def schedule(self, numPlayers, numRounds):
+        raise NotImplementedError("This function has not been implemented")
+
+    # returns the order of round r of the given tournament
+    def roundOrder(self, r, tournament):
+        return self.orders[r]
+
+"""A new random perfect pairing every round."""
+class RandomPairing(Pairing):
+    def schedule(self, numPlayers, numRounds):
+        indices = range(numPlayers)
+        self.orders = [random.sample(indices, numPlayers)
+                       for r in range(numRounds)]
+
+"""Round-robin pairings by the circle method: the first player stays in
+place while the others rotate, so nobody meets the same opponent twice
+until everyone has met. Players are shuffled first so that the order of the
+population doesn't decide who meets whom. Schedules cycle when there are
+more rounds than opponents."""
+class RoundRobinPairing(Pairing):
+    def schedule(self, numPlayers, numRounds):
+        circle = random.sample(range(numPlayers), numPlayers)
+        # with an odd number of players, None marks the bye
+        if numPlayers % 2 == 1:
+            circle.append(None)
+        size = len(circle)
+        self.orders = []
+        for r in range(min(numRounds, size - 1)):
+            order = []
+            bye = []
+            for i in range(size / 2):
+                pair = [circle[i], circle[size - 1 - i]]
+                if None in pair:
+                    bye = [p for p in pair if p is not None]
+                else:
+                    order.extend(pair)
+            self.orders.append(order + bye)
+            # rotates everyone but the first player by one position
+            circle = [circle[0], circle[-1]] + circle[1:-1]
+
+    # cycles through the schedule when there are more rounds than opponents
+    def roundOrder(self, r, tournament):
+        return self.orders[r % len(self.orders)]
+
+"""Swiss-style pairings: the first round is random, then every round pairs
+players with similar cumulative scores. Because it depends on the scores
+reached so far, each round after the first is computed when it starts."""
+class SwissPairing(Pairing):
+    def schedule(self, numPlayers, numRounds):
+        self.orders = [random.sample(range(numPlayers), numPlayers)]
+
+    def roundOrder(self, r, tournament):
+        if r == 0:
+            return self.orders[0]
+        scores = tournament.scores()
+        # shuffles first so that ties are broken at random
+        order = random.sample(range(len(scores)), len(scores))
+        order.sort(key=lambda i: -scores[i])
+        return order
+
+# map from pairing name to class type
+pairings = {
+    'random': RandomPairing,
+    'roundrobin': RoundRobinPairing,
+    'swiss': SwissPairing,
+    }
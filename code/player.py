@@ -1,19 +1,59 @@
 import random
 import math
-import copy
 
 MOVE_COOP = 1
 MOVE_DEFECT = 0
 
+# the next unused player id. ids are unique within a run and trace lineages.
+nextId = 0
+
+"""Reserves count new player ids and returns the first of them"""
+def reserveIds(count=1):
+    global nextId
+    first = nextId
+    nextId += count
+    return first
+
 """An interface for players. Players have parameters that affect how the player
 behaves. A Player will return a move given the properties of its opponent."""
 class Player(object):
+    # where moves are drawn from: the random module, unless a tournament
+    # gives the player a stream of its own (see streams.py)
+    rng = random
+
     def __init__(self):
         self.score = 0 # keeps the score throughout each round
         self.weights = [] # 0 - cooperation rate. 1 - constant. 2-n - moves
         self.attrs = []
         self.num_moves = 1
-    
+        self.id = reserveIds() # unique id of the player
+        self.parents = () # ids of the players this one was made from
+
+    """The attrs are 0 - cooperation rate, 1 - constant (always 1), 2-n - the
+    opponent's last moves, most recent first, -1 where unknown. The last
+    moves are kept in a ring buffer, history[head] being the most recent, so
+    a new move doesn't shift the others. attrs builds the list view."""
+    @property
+    def attrs(self):
+        if self.rate is None: # players without attrs, like Blotto
+            return []
+        size = len(self.history)
+        return [self.rate, 1] + [self.history[(self.head + k) % size]
+                                 for k in range(size)]
+
+    @attrs.setter
+    def attrs(self, attrs):
+        self.rate = attrs[0] if attrs else None
+        self.history = list(attrs[2:])
+        self.head = 0
+        self.filled = len(self.history) - self.history.count(-1)
+
+    """The number of attrs equal to 0 or 1, i.e. attrs.count(0) +
+    attrs.count(1): the constant, the known moves, and the cooperation rate
+    when it is exactly 0 or 1. It is 1 before any move was played."""
+    def known(self):
+        return 1 + self.filled + (self.rate == 0 or self.rate == 1)
+
     """ take in a player and return either MOVE_COOP or MOVE_DEFECT """
     def returnMove(self, player):
         raise NotImplementedError("This function has not been implemented")
@@ -21,31 +61,28 @@ class Player(object):
     """Computes the dot product of the players weights with the already
     initialized moves"""
     def playerDot(self):
-        num_zeros = self.attrs.count(0)
-        num_ones = self.attrs.count(1)
-        count = 0
-        for i in range(len(self.weights)):
-            if(self.attrs[i] != -1):
-                count = count + self.weights[i]*self.attrs[i]
-        return count/(num_zeros+num_ones)
+        count = self.weights[1]
+        if(self.rate != -1):
+            count = count + self.weights[0]*self.rate
+        size = len(self.history)
+        for k in range(self.filled):
+            count = count + self.weights[k+2]*self.history[(self.head+k) % size]
+        return count/self.known()
 
     # copies a player. includes weighs. 
     def copy(self):
         player = self.__class__(self.num_moves)
-        player.weights = copy.deepcopy(self.weights)        
+        player.weights = list(self.weights) # weights are flat numbers
+        player.parents = (self.id,)
         return player    
 
-    # updates attrs to include the opponent's next move
+    # updates attrs to include the opponent's next move, overwriting the
+    # oldest move once all n are known
     def informMove(self, move):
-        num_zeros = self.attrs.count(0)
-        num_ones = self.attrs.count(1)
-        if(num_ones+num_zeros == 1): # no moves played yet
-            self.attrs[2] = move
-            return
-
-        for i in range(self.num_moves,1,-1): # adjust forward last n moves
-            self.attrs[i+1] = self.attrs[i]
-        self.attrs[2] = move
+        self.head = (self.head - 1) % len(self.history)
+        self.history[self.head] = move
+        if(self.filled < len(self.history)):
+            self.filled += 1
         return
 
 """A class for simple player. Only considers the opponent's last move.
@@ -60,17 +97,15 @@ class SimplePlayer(Player):
 
     # returns a move given the opponent player
     def returnMove(self, p):
-        num_zeros = p.attrs.count(0)
-        num_ones = p.attrs.count(1)
-        if(num_zeros+num_ones == 1): # only stationary weight and coop
-            return random.randrange(0,2)
+        if(p.known() == 1): # only stationary weight and coop
+            return self.rng.randrange(0,2)
         measure = self.playerDot()
         # uses the formula p = e^c/(1+e^c) where c is the linear combination
         # of attributes
         probability = math.exp(measure)/(1+math.exp(measure))
 
         # generates move
-        if(random.uniform(0,1) < probability):
+        if(self.rng.uniform(0,1) < probability):
             return 1
         else:
             return 0
@@ -87,11 +122,8 @@ class NMovePlayer(Player): # assumes n>0
         for i in range(self.num_moves+2):
             self.weights.append(random.uniform(-1,1))
         """First attribute is 1 to ensure the constant is present"""
-        self.attrs = [-1, 1]
-
         # the remaining moves are -1, since round hasn't started
-        for i in range(self.num_moves):
-            self.attrs.append(-1)
+        self.attrs = [-1, 1] + [-1] * self.num_moves
 
         self.num_moves = n
         self.moves_played = 0 # moves played so far
@@ -99,12 +131,10 @@ class NMovePlayer(Player): # assumes n>0
 
     # returns a move given the opponent player
     def returnMove(self, p):
-        num_zeros = p.attrs.count(0)
-        num_ones = p.attrs.count(1)
-        if(num_ones+num_zeros == 1): # no moves played yet
+        if(p.known() == 1): # no moves played yet
             self.moves_played = 1
-            self.coops = random.randrange(0,2) # set number of cooperations
-            self.attrs[0] = self.coops
+            self.coops = self.rng.randrange(0,2) # set number of cooperations
+            self.rate = self.coops
             return self.coops
 
         # if moves have been played
@@ -113,7 +143,7 @@ class NMovePlayer(Player): # assumes n>0
         # uses the formula p = e^c/(1+e^c) where c is the linear combination
         # of attributes
         probability = math.exp(measure)/(1+math.exp(measure))
-        if(random.uniform(0,1) < probability):
+        if(self.rng.uniform(0,1) < probability):
             move = 1
         else:
             move = 0
@@ -121,11 +151,93 @@ class NMovePlayer(Player): # assumes n>0
         # updates the number of cooperationsa and moves played  
         self.coops += move
         self.moves_played += 1
-        self.attrs[0] = float(self.coops)/self.moves_played
+        self.rate = float(self.coops)/self.moves_played
 
         return move
 
 
+"""A player that considers the opponent's last n moves like NMovePlayer, but
+not its own cooperation rate, so that its move only depends on those n
+moves. The moves are packed into one integer, the state: a 1 bit followed by
+the known moves, the most recent in bit 0. The probability of cooperating in
+a state is computed from the weights the first time the state is visited
+and kept in a table, so a move in a visited state costs a lookup and each
+informed move a shift. Only visited states are computed, so the table costs
+at most one computation per move, even when n is large.
+The weights are [0 (unused), constant, last n moves], like NMovePlayer's
+without the cooperation rate weight, and the attrs view is the same as
+NMovePlayer's with an unknown cooperation rate, so the batched engine plays
+these players exactly."""
+class LookupPlayer(Player):
+    def __init__(self, n):
+        self.num_moves = n
+        self.full = 1 << n # the state bit of n known moves
+        super(LookupPlayer, self).__init__()
+        self.weights = [0] + [random.uniform(-1, 1) for i in range(n + 1)]
+        self.num_moves = n
+
+    # anyone reading the weights may change them in place, so the table is
+    # emptied
+    @property
+    def weights(self):
+        self.table = {}
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights):
+        self.table = {}
+        self._weights = weights
+
+    @property
+    def attrs(self):
+        filled = self.state.bit_length() - 1
+        return [-1, 1] + [(self.state >> k) & 1 if k < filled else -1
+                          for k in range(self.num_moves)]
+
+    @attrs.setter
+    def attrs(self, attrs):
+        moves = [move for move in attrs[2:] if move != -1]
+        self.state = 1 << len(moves)
+        for k, move in enumerate(moves):
+            self.state |= int(move) << k
+
+    # the constant and the known moves
+    def known(self):
+        return self.state.bit_length()
+
+    """The probability of cooperating in a state, kept in the table: the
+    logistic of the dot product of the weights with the known moves, divided
+    by the number of moves known plus 1, like playerDot"""
+    def probability(self, state):
+        weights = self._weights
+        filled = state.bit_length() - 1
+        total = weights[1]
+        for k in range(filled):
+            if (state >> k) & 1:
+                total += weights[k + 2]
+        probability = 1 / (1 + math.exp(-total / (filled + 1)))
+        self.table[state] = probability
+        return probability
+
+    # returns a move given the opponent player
+    def returnMove(self, p):
+        if(p.known() == 1): # no moves played yet
+            return self.rng.randrange(0,2)
+        probability = self.table.get(self.state)
+        if probability is None:
+            probability = self.probability(self.state)
+        if(self.rng.uniform(0,1) < probability):
+            return 1
+        else:
+            return 0
+
+    # adds the opponent's move as the most recent, dropping the oldest once
+    # all n are known
+    def informMove(self, move):
+        self.state = (self.state << 1) | move
+        if self.state >= 2 * self.full:
+            self.state = (self.state & (self.full - 1)) | self.full
+
 # A representation for a Blotto player that does not consider the opponent
 class BlottoPlayer(Player):
     def __init__(self, num_castles = 10):
@@ -0,0 +1,230 @@
+import numpy as np
+from player import *
+
+"""A compact, array-backed population. The genomes (weights) of all players
+live in one contiguous float array with a row per player, next to a score
+array and a small kind array saying which player type each row is. Rows of
+shorter genomes are padded with zeros. Cloning, perturbing and ranking are
+slice operations on these arrays, and Player objects are only created when a
+piece of code asks for them."""
+
+# returns the length of the weights of a player type with numMoves moves
+def genomeLength(playerType, numMoves):
+    if playerType is SimplePlayer:
+        return 3
+    if playerType is NMovePlayer or playerType is LookupPlayer:
+        return numMoves + 2
+    return numMoves # Blotto: one weight per castle
+
+# returns count random genomes, drawn like the player type's constructor
+def randomGenomes(playerType, count, numMoves, rng=np.random):
+    if playerType is BlottoPlayer:
+        # cumulative number of soldiers, then the difference of consecutive
+        # elements gives the soldiers per castle
+        cuts = np.sort(rng.randint(0, 101, (count, numMoves - 1)), axis=1)
+        bounds = np.column_stack((np.zeros(count, dtype=int), cuts,
+                                  np.full(count, 100)))
+        return np.diff(bounds, axis=1).astype(float)
+    weights = rng.uniform(-1, 1, (count, genomeLength(playerType, numMoves)))
+    if playerType is SimplePlayer or playerType is LookupPlayer:
+        weights[:, 0] = 0 # the cooperation rate weight is unused
+    return weights
+
+"""Perturbs one random weight of every row of weights by up to scale, row i
+having lengths[i] weights"""
+def perturbWeights(weights, lengths, scale, rng=np.random):
+    rows = np.arange(len(weights))
+    index = (rng.random_sample(len(weights)) * lengths).astype(int)
+    weights[rows, index] += rng.uniform(-scale, scale, len(weights))
+
+"""Moves randrange(0, change) units from one random weight to another in
+every row of weights, when the first is below limit and the second above 0"""
+def transferWeights(weights, lengths, change, limit, rng=np.random):
+    rows = np.arange(len(weights))
+    index1 = (rng.random_sample(len(weights)) * lengths).astype(int)
+    index2 = (rng.random_sample(len(weights)) * lengths).astype(int)
+    amount = rng.randint(0, change, len(weights))
+    amount *= (weights[rows, index1] < limit) & (weights[rows, index2] > 0)
+    weights[rows, index1] += amount
+    weights[rows, index2] -= amount
+
+class Population(object):
+    def __init__(self, weights, kinds, types, scores=None, ids=None,
+                 parents=None):
+        self.weights = weights # (players, width) float array of genomes
+        self.kinds = kinds # row i is a player of type types[kinds[i]]
+        self.types = types # list of (player type, number of moves)
+        if scores is None:
+            scores = np.zeros(len(weights))
+        self.scores = scores
+        # unique player ids, and the ids of up to two parents (-1 for none)
+        if ids is None:
+            ids = reserveIds(len(weights)) + np.arange(len(weights))
+        self.ids = ids
+        if parents is None:
+            parents = np.full((len(weights), 2), -1, dtype=int)
+        self.parents = parents
+        self.lengths = np.array([genomeLength(t, n) for t, n in types],
+                                dtype=np.int16)[kinds]
+
+    """Returns a population of size random players of one type"""
+    @classmethod
+    def random(cls, playerType, size, numMoves=1, rng=np.random):
+        return cls(randomGenomes(playerType, size, numMoves, rng),
+                   np.zeros(size, dtype=np.int8), [(playerType, numMoves)])
+
+    """Packs a list of Player objects into a population"""
+    @classmethod
+    def fromPlayers(cls, players):
+        types = []
+        kinds = np.zeros(len(players), dtype=np.int8)
+        width = max(len(p.weights) for p in players)
+        weights = np.zeros((len(players), width))
+        scores = np.zeros(len(players))
+        ids = np.zeros(len(players), dtype=int)
+        parents = np.full((len(players), 2), -1, dtype=int)
+        for i, p in enumerate(players):
+            kind = (p.__class__, p.num_moves)
+            if kind not in types:
+                types.append(kind)
+            kinds[i] = types.index(kind)
+            weights[i, :len(p.weights)] = p.weights
+            scores[i] = p.score
+            ids[i] = p.id
+            parents[i, :len(p.parents)] = p.parents
+        return cls(weights, kinds, types, scores, ids, parents)
+
+    """Concatenates populations, e.g. the clones and the new random players
+    of a generation"""
+    @classmethod
+    def concat(cls, populations):
+        types = []
+        for population in populations:
+            for kind in population.types:
+                if kind not in types:
+                    types.append(kind)
+        width = max(p.weights.shape[1] for p in populations)
+        weights = np.zeros((sum(len(p) for p in populations), width))
+        kinds = np.zeros(len(weights), dtype=np.int8)
+        start = 0
+        for p in populations:
+            end = start + len(p)
+            weights[start:end, :p.weights.shape[1]] = p.weights
+            remap = np.array([types.index(kind) for kind in p.types])
+            kinds[start:end] = remap[p.kinds]
+            start = end
+        return cls(weights, kinds, types,
+                   np.concatenate([p.scores for p in populations]),
+                   np.concatenate([p.ids for p in populations]),
+                   np.concatenate([p.parents for p in populations]))
+
+    def __len__(self):
+        return len(self.weights)
+
+    # returns a lightweight view of player i
+    def __getitem__(self, i):
+        return PlayerView(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PlayerView(self, i)
+
+    # bytes used by the arrays of the population
+    def nbytes(self):
+        return self.weights.nbytes + self.kinds.nbytes + self.scores.nbytes \
+            + self.lengths.nbytes + self.ids.nbytes + self.parents.nbytes
+
+    """Clones the players at the given indices (repeats allowed) into a new
+    population. Like Player.copy, the clones start with a score of 0."""
+    def take(self, indices):
+        clones = Population(self.weights[indices], self.kinds[indices],
+                            self.types)
+        clones.parents[:, 0] = self.ids[indices]
+        return clones
+
+    """Children of the players first[k] and second[k] with the given
+    genomes. Like a copy of the first parent, each child has its type."""
+    def children(self, first, second, weights):
+        children = Population(weights, self.kinds[first], self.types)
+        children.parents[:, 0] = self.ids[first]
+        children.parents[:, 1] = self.ids[second]
+        return children
+
+    """The players at the given indices as they are, with their ids and
+    scores"""
+    def subset(self, indices):
+        return Population(self.weights[indices], self.kinds[indices],
+                          self.types, self.scores[indices], self.ids[indices],
+                          self.parents[indices])
+
+    """Perturbs one random weight of every player by up to scale, like
+    SimpleEvolution._evolve_player does for a single player"""
+    def perturb(self, scale, rng=np.random):
+        perturbWeights(self.weights, self.lengths, scale, rng)
+
+    """Moves randrange(0, change) units from one random weight to another in
+    every player, when the first is below limit and the second above 0, like
+    BlottoEvolution._evolve_player moves soldiers between castles"""
+    def transfer(self, change, limit, rng=np.random):
+        transferWeights(self.weights, self.lengths, change, limit, rng)
+
+    # indices of the players sorted by decreasing score. Ties keep their
+    # order, like sorted() does.
+    def ranking(self):
+        return np.argsort(-self.scores, kind='mergesort')
+
+    # creates the Player object for row i
+    def toPlayer(self, i):
+        playerType, numMoves = self.types[self.kinds[i]]
+        player = playerType(numMoves)
+        weights = self.weights[i, :self.lengths[i]]
+        if playerType is BlottoPlayer:
+            player.weights = [int(w) for w in weights]
+        else:
+            player.weights = weights.tolist()
+        player.score = self.scores[i].item()
+        player.id = self.ids[i].item()
+        player.parents = tuple(p for p in self.parents[i].tolist() if p >= 0)
+        return player
+
+    """Creates Player objects for code that still works on them"""
+    def toPlayers(self):
+        return [self.toPlayer(i) for i in range(len(self))]
+
+"""A view of one player of a population. It stores nothing but the population
+and the row, and reads and writes the weights and score in place."""
+class PlayerView(object):
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    @property
+    def weights(self):
+        return self.population.weights[self.index,
+                                        :self.population.lengths[self.index]]
+
+    @property
+    def score(self):
+        return self.population.scores[self.index]
+
+    @score.setter
+    def score(self, value):
+        self.population.scores[self.index] = value
+
+    @property
+    def id(self):
+        return self.population.ids[self.index]
+
+    @property
+    def num_moves(self):
+        return self.population.types[self.population.kinds[self.index]][1]
+
+    # copies the player into a standalone Player object
+    def copy(self):
+        player = self.population.toPlayer(self.index)
+        player.score = 0
+        player.id = reserveIds()
+        player.parents = (self.id,)
+        return player
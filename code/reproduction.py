@@ -0,0 +1,29 @@
+import numpy as np
+
+"""Batched reproduction kernels for compact populations. Instead of copying
+player 1 and averaging the weights of every couple in a Python loop, the
+genomes of all the children of a generation are computed at once from the
+weight array of the population and the indices of the two parents of each
+child."""
+
+"""Every couple of count parents, in the order SimpleSex makes them: (0, 1),
+(0, 2), ..., (1, 2), ... Returns the positions of the first and second
+parents."""
+def parentPairs(count):
+    return np.triu_indices(count, 1)
+
+"""Children with the plain average of their parents' genomes"""
+def averageChildren(weights, first, second):
+    return (weights[first] + weights[second]) / 2
+
+"""Children with the average of their parents' genomes weighted by the
+parents' scores. Couples that both scored zero are weighted equally."""
+def weightedChildren(weights, scores, first, second):
+    score1 = scores[first].astype(float)
+    score2 = scores[second].astype(float)
+    zero = (score1 == 0) & (score2 == 0)
+    score1[zero] = 1
+    score2[zero] = 1
+    return (weights[first] * score1[:, np.newaxis] +
+            weights[second] * score2[:, np.newaxis]) / \
+        (score1 + score2)[:, np.newaxis]
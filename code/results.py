@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import threading
+import Queue
+import numpy as np
+from population import Population
+
+"""Streams the full population of every generation to disk. A results
+directory holds one chunk per generation, gen_000000, gen_000001, ...; each
+chunk is a directory with one .npy file per column (weights, scores, ids,
+parents, kinds) and a meta.json with the generation number, the evolution
+operator that produced the generation and the player types. Chunks are
+written once and never changed, so a run can be read while it is still
+going, and np.load(..., mmap_mode='r') maps the columns without reading
+them."""
+
+COLUMNS = ['weights', 'scores', 'ids', 'parents', 'kinds']
+
+# directory of the chunk of a generation
+def chunkPath(directory, generation):
+    return os.path.join(directory, 'gen_%06d' % generation)
+
+"""Writes generations in a background thread, so that the simulation never
+waits on the disk. At most maxPending generations are queued; past that,
+write blocks until the thread catches up."""
+class ResultsWriter(object):
+    def __init__(self, directory, maxPending=4):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.queue = Queue.Queue(maxPending)
+        self.error = None # first exception raised by the writing thread
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    """Queues a generation of players (a Population or a list of Players),
+    with the name of the evolution operator that produced it"""
+    def write(self, generation, players, operator):
+        if self.error is not None:
+            raise self.error
+        if isinstance(players, list):
+            population = Population.fromPlayers(players)
+        else:
+            population = players
+        # copies the columns, since the simulation goes on with the arrays
+        columns = {'weights': population.weights.copy(),
+                   'scores': population.scores.copy(),
+                   'ids': population.ids.copy(),
+                   'parents': population.parents.copy(),
+                   'kinds': population.kinds.copy()}
+        meta = {'generation': generation, 'operator': operator,
+                'types': [[t.__name__, n] for t, n in population.types]}
+        self.queue.put((generation, columns, meta))
+
+    """Waits for all queued generations to be written"""
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    # writes queued generations until close puts None in the queue
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self._writeChunk(*item)
+            except Exception as e:
+                self.error = e
+
+    # writes a chunk into a temporary directory and renames it, so readers
+    # never see half-written chunks
+    def _writeChunk(self, generation, columns, meta):
+        path = chunkPath(self.directory, generation)
+        partial = path + '.partial'
+        if not os.path.isdir(partial):
+            os.makedirs(partial)
+        for name in COLUMNS:
+            np.save(os.path.join(partial, name + '.npy'), columns[name])
+        with open(os.path.join(partial, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        # a resumed run writes the generations after its checkpoint again
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(partial, path)
+
+"""Reads the generations of a results directory, memory-mapping the
+columns."""
+class ResultsReader(object):
+    def __init__(self, directory):
+        self.directory = directory
+
+    # the generations written so far, in order
+    def generations(self):
+        names = [name for name in os.listdir(self.directory)
+                 if name.startswith('gen_') and not name.endswith('.partial')]
+        return sorted(int(name[4:]) for name in names)
+
+    # the meta data of a generation
+    def meta(self, generation):
+        with open(os.path.join(chunkPath(self.directory, generation),
+                               'meta.json')) as f:
+            return json.load(f)
+
+    # a column of a generation, memory-mapped
+    def column(self, generation, name):
+        return np.load(os.path.join(chunkPath(self.directory, generation),
+                                    name + '.npy'), mmap_mode='r')
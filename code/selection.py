@@ -0,0 +1,90 @@
+import random
+import heapq
+import bisect
+
+"""Selection strategies choose which players of a generation reproduce. They
+work on the scores alone, a list of scores for lists of players or a numpy
+array for compact populations, and return the indices of the chosen players,
+best first where that means something. Arrays are handled with vectorized
+numpy operations, so selection stays near-linear for large populations."""
+
+class Selection(object):
+    """Returns the indices of count players chosen from scores"""
+    def select(self, scores, count):
+        raise NotImplementedError("This function has not been implemented")
+
+"""Chooses the count best players, by partial selection instead of sorting
+the whole population. Ties keep the population order, like sorted() does."""
+class TopSelection(Selection):
+    def select(self, scores, count):
+        count = min(count, len(scores))
+        if isinstance(scores, list):
+            return heapq.nlargest(count, range(len(scores)),
+                                  key=scores.__getitem__)
+        import numpy as np
+        if count == 0:
+            return np.zeros(0, dtype=int)
+        # the count-th best score, then everyone above it and as many of
+        # the first players with exactly that score as needed
+        threshold = -np.partition(-scores, count - 1)[count - 1]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:count - len(above)]
+        best = np.concatenate((above, ties))
+        # orders the best by decreasing score, then by index
+        return best[np.lexsort((best, -scores[best]))]
+
+"""Tournament selection: each choice is the best of size players drawn at
+random, so weaker players are sometimes chosen too."""
+class TournamentSelection(Selection):
+    def __init__(self, size=2):
+        self.size = size # players in each tournament
+
+    def select(self, scores, count):
+        if isinstance(scores, list):
+            chosen = []
+            for i in range(count):
+                entrants = [random.randrange(0, len(scores))
+                            for j in range(self.size)]
+                chosen.append(max(entrants, key=scores.__getitem__))
+            return chosen
+        import numpy as np
+        entrants = np.random.randint(0, len(scores), (count, self.size))
+        best = scores[entrants].argmax(axis=1)
+        return entrants[np.arange(count), best]
+
+"""Fitness-proportional selection by stochastic universal sampling: count
+evenly spaced pointers with a random offset over the cumulative scores, so
+each player is chosen about count * score / total times. Scores are shifted
+to start at 0 when some are negative; when they are all 0, players are
+chosen uniformly, with replacement like the pointers."""
+class ProportionalSelection(Selection):
+    def select(self, scores, count):
+        if isinstance(scores, list):
+            low = min(min(scores), 0)
+            cumulative = []
+            total = 0.0
+            for score in scores:
+                total += score - low
+                cumulative.append(total)
+            if total == 0:
+                return [random.randrange(len(scores)) for k in range(count)]
+            step = total / count
+            start = random.uniform(0, step)
+            return [min(bisect.bisect_right(cumulative, start + k * step),
+                        len(scores) - 1) for k in range(count)]
+        import numpy as np
+        cumulative = np.cumsum(scores - min(scores.min(), 0))
+        total = cumulative[-1]
+        if total == 0:
+            return np.random.randint(0, len(scores), count)
+        step = total / count
+        pointers = np.random.uniform(0, step) + step * np.arange(count)
+        return np.minimum(np.searchsorted(cumulative, pointers, side='right'),
+                          len(scores) - 1)
+
+# map from selection name to class type
+selections = {
+    'top': TopSelection,
+    'tournament': TournamentSelection,
+    'proportional': ProportionalSelection,
+    }
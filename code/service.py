@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import Queue
+import socket
+import threading
+import collections
+import multiprocessing
+import SocketServer
+
+"""A local experiment service. It takes experiments (dicts of settings, see
+experiment.py) over a socket, runs them in at most a fixed number of worker
+processes, one process per experiment, queues the others, and streams the
+summary of every generation (best score and weights, quartiles of the
+scores, time taken) to the clients watching them.
+
+Clients talk to it over TCP on localhost, one JSON object per line. A
+request is {"op": "submit", "config": {...}}, {"op": "cancel", "job": ID},
+{"op": "status"} or {"op": "watch", "job": ID}, and is answered with one
+line, except watch, which replays the events of the job so far and then
+sends its events as they come, until the job ends. Events are
+{"event": "queued" | "started" | "generation" | "finished" | "cancelled" |
+"failed", "job": ID, ...}.
+
+It keeps up with many runs and slow clients:
+- submissions are refused, with an error, once maxQueued jobs are waiting,
+- runs block when the events they send are not read fast enough,
+- a client watching a job never holds up the others: when it falls more
+  than a buffer behind, generation events are dropped for it, and the next
+  event it gets says how many were skipped,
+- cancelling a running job stops it at the end of its current generation,
+- a run whose process dies without ending its job (killed, crashed) fails
+  its job and frees its worker.
+
+Island models (the 'islands' setting) report no generations and can't be
+cancelled, so they are refused.
+
+python service.py serve [--port P] [--workers K] [--queue N]
+python service.py submit CONFIG_JSON [--port P] [--watch]
+python service.py watch|cancel JOB [--port P]
+python service.py status [--port P]"""
+
+DEFAULT_PORT = 7878
+EVENT_BUFFER = 256 # events of all runs waiting for the service to read them
+WATCH_BUFFER = 64 # events waiting for a slow client, per client
+ENDS = ['finished', 'cancelled', 'failed'] # events that end a job
+
+"""Raised in a run's process to stop it when its job is cancelled"""
+class Cancelled(Exception):
+    pass
+
+"""Raised when a submission can't be queued"""
+class QueueFull(Exception):
+    pass
+
+# runs the experiment of a job in a worker process, sending its events
+def _runJob(job, config, events, cancel):
+    from experiment import runExperiment
+    def listener(summary):
+        events.put((job, 'generation', summary))
+        if cancel.is_set():
+            raise Cancelled()
+    try:
+        result = runExperiment(config, listener)
+        events.put((job, 'finished',
+                    {'bestScores': [float(s) for s in
+                                    result.get('bestScores', [])]}))
+    except Cancelled:
+        events.put((job, 'cancelled', {}))
+    except Exception as error:
+        events.put((job, 'failed', {'error': repr(error)}))
+
+"""The events of one job waiting for one client. The service never waits
+for a client: once size events are waiting, generation events are dropped,
+and the next event put says how many were skipped. The events ending a job
+are always kept."""
+class Watcher(object):
+    def __init__(self, size=WATCH_BUFFER):
+        self.size = size
+        self.pending = collections.deque()
+        self.skipped = 0
+        self.condition = threading.Condition()
+
+    def put(self, event):
+        with self.condition:
+            if event['event'] == 'generation' and \
+                    len(self.pending) >= self.size:
+                self.skipped += 1
+                return
+            if self.skipped > 0:
+                event = dict(event, skipped=self.skipped)
+                self.skipped = 0
+            self.pending.append(event)
+            self.condition.notify()
+
+    # the next event, waiting for it
+    def get(self):
+        with self.condition:
+            while not self.pending:
+                # waits with a timeout, so the thread can be interrupted
+                self.condition.wait(1.0)
+            return self.pending.popleft()
+
+"""A submitted experiment"""
+class Job(object):
+    def __init__(self, id, config):
+        self.id = id
+        self.config = config
+        self.state = 'queued'
+        self.events = [] # all events so far, replayed to new watchers
+        self.watchers = []
+        self.cancel = multiprocessing.Event()
+        self.process = None
+
+    # the job as shown by status
+    def describe(self):
+        return {'job': self.id, 'state': self.state, 'config': self.config,
+                'generations': sum(1 for event in self.events
+                                   if event['event'] == 'generation')}
+
+"""Runs submitted experiments in at most workers processes at a time,
+queuing up to maxQueued more"""
+class ExperimentService(object):
+    def __init__(self, workers=2, maxQueued=16):
+        self.workers = workers
+        self.maxQueued = maxQueued
+        # events sent by the runs; bounded, so runs wait when it's full
+        self.events = multiprocessing.Queue(EVENT_BUFFER)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.queued = collections.deque()
+        self.running = set()
+        self.nextId = 1
+        self.dispatcher = threading.Thread(target=self.dispatch)
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    """Queues an experiment and returns its job id"""
+    def submit(self, config):
+        from experiment import DEFAULTS
+        for name in config:
+            if name not in DEFAULTS:
+                raise ValueError("unknown setting " + name)
+        if config.get('islands', 0) > 0:
+            raise ValueError("the service doesn't run island models")
+        with self.lock:
+            if len(self.queued) >= self.maxQueued:
+                raise QueueFull("%d jobs are already waiting" %
+                                len(self.queued))
+            job = Job(self.nextId, config)
+            self.nextId += 1
+            self.jobs[job.id] = job
+            self.queued.append(job)
+            self.publish(job, 'queued', {})
+            self.startJobs()
+        return job.id
+
+    # starts queued jobs while there are free workers; the lock is held
+    def startJobs(self):
+        while self.queued and len(self.running) < self.workers:
+            job = self.queued.popleft()
+            job.process = multiprocessing.Process(target=_runJob,
+                args=(job.id, job.config, self.events, job.cancel))
+            job.process.start()
+            self.running.add(job.id)
+            job.state = 'running'
+            self.publish(job, 'started', {})
+
+    """Cancels a job: a queued job is dropped, a running one stops at the
+    end of its current generation"""
+    def cancel(self, id):
+        with self.lock:
+            job = self.jobs[id]
+            if job.state == 'queued':
+                self.queued.remove(job)
+                self.publish(job, 'cancelled', {})
+            elif job.state == 'running':
+                job.cancel.set()
+
+    # adds an event to the history of a job and passes it to its watchers;
+    # the lock is held
+    def publish(self, job, kind, payload):
+        event = dict(payload, event=kind, job=job.id)
+        job.events.append(event)
+        if kind in ENDS:
+            job.state = kind
+        for watcher in job.watchers:
+            watcher.put(event)
+        if kind in ENDS:
+            job.watchers = []
+
+    # reads the events of the runs, and starts the next jobs as runs end
+    def dispatch(self):
+        while True:
+            try:
+                self.handle(*self.events.get(timeout=1.0))
+            except Queue.Empty:
+                self.reap()
+
+    # publishes an event of a run, and frees its worker if it ends the job
+    def handle(self, id, kind, payload):
+        with self.lock:
+            job = self.jobs[id]
+            if job.state in ENDS:
+                return
+            self.publish(job, kind, payload)
+        if kind in ENDS:
+            self.finish(job)
+
+    # waits for the process of an ended job and starts the next jobs
+    def finish(self, job):
+        job.process.join()
+        with self.lock:
+            self.running.discard(job.id)
+            self.startJobs()
+
+    # fails the running jobs whose process exited without ending them
+    def reap(self):
+        with self.lock:
+            exited = [self.jobs[id] for id in self.running
+                      if self.jobs[id].process.exitcode is not None]
+        if not exited:
+            return
+        # a process sends all its events before it exits, so the events
+        # waiting now include the last ones of the exited runs
+        while True:
+            try:
+                self.handle(*self.events.get_nowait())
+            except Queue.Empty:
+                break
+        for job in exited:
+            with self.lock:
+                if job.state in ENDS:
+                    continue
+                self.publish(job, 'failed', {'error':
+                    "process exited with code %d" % job.process.exitcode})
+            self.finish(job)
+
+    """A Watcher getting the events of a job so far, then the next ones"""
+    def watch(self, id):
+        watcher = Watcher()
+        with self.lock:
+            job = self.jobs[id]
+            for event in job.events:
+                watcher.put(event)
+            if job.state not in ENDS:
+                job.watchers.append(watcher)
+        return watcher
+
+    # stops sending events to a watcher whose client went away
+    def unwatch(self, id, watcher):
+        with self.lock:
+            if watcher in self.jobs[id].watchers:
+                self.jobs[id].watchers.remove(watcher)
+
+    # the state of every job
+    def status(self):
+        with self.lock:
+            return [self.jobs[id].describe() for id in sorted(self.jobs)]
+
+    """Cancels every job and waits for the running ones to stop"""
+    def close(self):
+        with self.lock:
+            ids = list(self.jobs)
+        for id in ids:
+            self.cancel(id)
+        with self.lock:
+            processes = [self.jobs[id].process for id in self.running]
+        for process in processes:
+            process.join()
+
+# answers the requests of one client connection
+class _Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        for line in iter(self.rfile.readline, ''):
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'submit':
+                    self.send({'ok': True,
+                               'job': service.submit(request['config'])})
+                elif op == 'cancel':
+                    service.cancel(request['job'])
+                    self.send({'ok': True})
+                elif op == 'status':
+                    self.send({'ok': True, 'jobs': service.status()})
+                elif op == 'watch':
+                    self.stream(service, request['job'])
+                else:
+                    self.send({'ok': False, 'error': "unknown op %s" % op})
+            except (ValueError, KeyError, QueueFull) as error:
+                self.send({'ok': False, 'error': str(error)})
+
+    # sends the events of a job until it ends
+    def stream(self, service, id):
+        watcher = service.watch(id)
+        try:
+            while True:
+                event = watcher.get()
+                self.send(event)
+                if event['event'] in ENDS:
+                    return
+        except socket.error:
+            service.unwatch(id, watcher)
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message) + '\n')
+        self.wfile.flush()
+
+"""The server of a service, on localhost"""
+class ServiceServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, service, port=DEFAULT_PORT):
+        SocketServer.TCPServer.__init__(self, ('127.0.0.1', port), _Handler)
+        self.service = service
+
+"""Sends a request to the service on port, and yields the lines of the
+answer as dicts: one, or the events of a job for watch"""
+def request(message, port=DEFAULT_PORT):
+    connection = socket.create_connection(('127.0.0.1', port))
+    try:
+        connection.sendall(json.dumps(message) + '\n')
+        reader = connection.makefile('r')
+        for line in iter(reader.readline, ''):
+            answer = json.loads(line)
+            yield answer
+            if message['op'] != 'watch' or answer.get('event') in ENDS or \
+                    answer.get('ok') is False:
+                return
+    finally:
+        connection.close()
+
+# takes the value of a flag out of args
+def _option(args, flag, default):
+    if flag not in args:
+        return default
+    index = args.index(flag)
+    value = args[index + 1]
+    del args[index:index + 2]
+    return type(default)(value)
+
+def main(args):
+    args = list(args)
+    port = _option(args, '--port', DEFAULT_PORT)
+    workers = _option(args, '--workers', 2)
+    maxQueued = _option(args, '--queue', 16)
+    watch = '--watch' in args
+    if watch:
+        args.remove('--watch')
+    if not args:
+        print __doc__
+        return 1
+
+    if args[0] == 'serve':
+        server = ServiceServer(ExperimentService(workers, maxQueued), port)
+        print "Serving experiments on port", port
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.service.close()
+        return 0
+    if args[0] == 'submit' and len(args) == 2:
+        answer = next(request({'op': 'submit',
+                               'config': json.loads(args[1])}, port))
+        print json.dumps(answer)
+        if not watch or not answer['ok']:
+            return 0 if answer['ok'] else 1
+        args = ['watch', answer['job']]
+    if args[0] in ['watch', 'cancel'] and len(args) == 2:
+        for answer in request({'op': args[0], 'job': int(args[1])}, port):
+            print json.dumps(answer)
+        return 0
+    if args[0] == 'status':
+        for job in next(request({'op': 'status'}, port))['jobs']:
+            print json.dumps(job)
+        return 0
+    print __doc__
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+from engine import PlayerArrays, BatchPrisonersDilemmaTournament, batchMatch
+
+"""Population arrays shared between processes. The arrays of the batched
+engine (weights, histories, cooperation counts and scores, see engine.py)
+are memory-mapped files in one directory, on /dev/shm where there is one so
+they stay in memory, and worker processes attach to them by the name of
+the directory. A tournament copies the population into them once; after
+that, each round only sends the workers the bounds of their share of the
+pairs, and the workers write the moves and scores of their pairs straight
+into the shared arrays. The pairs of a round are disjoint, so no two
+workers ever write the same row.
+
+Only the batched Prisoner's Dilemma engine works this way. The object-based
+tournaments (SimplePlayer, NMovePlayer, LookupPlayer and BlottoPlayer
+objects, see tournament.py) still pickle the players of every chunk to its
+worker and back each round."""
+
+# where the shared arrays live: memory-backed if the system has it
+def sharedDirectory():
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+"""PlayerArrays in memory-mapped files, plus the order of the current round.
+Created, they get a new directory; attached, they open the arrays of an
+existing one."""
+class SharedPlayerArrays(PlayerArrays):
+    def __init__(self, size, width, directory=None):
+        self.owner = directory is None # the creator removes the files
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='population-',
+                                         dir=sharedDirectory())
+        self.directory = directory
+        super(SharedPlayerArrays, self).__init__(size, width)
+        # order[2i] plays order[2i+1] in the current round
+        self.order = self.allocate('order', size, np.int64, 0)
+
+    """Opens the arrays created by another process in directory"""
+    @classmethod
+    def attach(cls, directory, size, width):
+        return cls(size, width, directory)
+
+    # a memory-mapped array in the directory
+    def allocate(self, name, shape, dtype, fill):
+        path = os.path.join(self.directory, name)
+        if not self.owner:
+            return np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+        array = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        array[...] = fill
+        return array
+
+    """Unmaps the arrays, and removes their files if this process created
+    them"""
+    def close(self):
+        for name in ['weights', 'attrs', 'valid', 'tracksCoops', 'coops',
+                     'movesPlayed', 'scores', 'order']:
+            setattr(self, name, None)
+        if self.owner:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+# the shared arrays and the settings of the tournament, in a worker process
+_worker = {}
+
+# attaches a worker process to the shared arrays of a tournament
+def _attach(directory, size, width, payoff, numMatches, common):
+    _worker['arrays'] = SharedPlayerArrays.attach(directory, size, width)
+    _worker['payoff'] = payoff
+    _worker['numMatches'] = numMatches
+    _worker['common'] = common
+
+# plays the matches of the pairs order[start:end] in a worker process and
+# returns the number of cooperative moves
+def _playChunk(task):
+    start, end, seed = task
+    arrays = _worker['arrays']
+    order = np.array(arrays.order[start:end])
+    first = order[0::2]
+    second = order[1::2]
+    rng = np.random.RandomState(seed)
+    cooperations = 0
+    for j in range(_worker['numMatches']):
+        cooperations += batchMatch(arrays, first, second, _worker['payoff'],
+                                   rng, _worker['common'])
+    return cooperations
+
+"""A batched Prisoner's Dilemma tournament whose rounds are split between
+parallelism worker processes sharing the population arrays. Each chunk of
+pairs draws its moves from its own seed, drawn from the tournament's
+generator, so results depend on the seed and the number of workers, not on
+which worker plays which chunk."""
+class SharedBatchPrisonersDilemmaTournament(BatchPrisonersDilemmaTournament):
+    arrayType = SharedPlayerArrays
+
+    # runs the tournament, then removes the shared arrays
+    def runTournament(self):
+        self.pool = None
+        try:
+            return super(SharedBatchPrisonersDilemmaTournament,
+                         self).runTournament()
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+            del self.pool
+            if getattr(self, 'arrays', None) is not None:
+                self.arrays.close()
+                del self.arrays
+
+    # plays the pairs of a round in chunks, one per worker
+    def runRound(self):
+        if self.streams is not None:
+            self.rng = self.streams.roundState(self.round)
+        # the workers attach to the arrays once per tournament
+        if self.pool is None:
+            arrays = self.arrays
+            common = self.streams is not None and self.streams.common()
+            self.pool = multiprocessing.Pool(self.parallelism, _attach,
+                (arrays.directory, arrays.size, arrays.weights.shape[1],
+                 self.payoff, self.numMatches, common))
+
+        order = np.asarray(self.createPairing())
+        numPairs = len(order) / 2
+        self.arrays.order[:2 * numPairs] = order[:2 * numPairs]
+        # chunk boundaries, always on a pair boundary
+        bounds = [2 * (numPairs * k / self.parallelism)
+                  for k in range(self.parallelism + 1)]
+        seeds = self.rng.randint(0, 2**31, self.parallelism)
+        tasks = [(bounds[k], bounds[k + 1], seeds[k])
+                 for k in range(self.parallelism)]
+        self.cooperations += sum(self.pool.map(_playChunk, tasks))
+        self.moves += 2 * numPairs * self.numMatches
@@ -0,0 +1,364 @@
+import multiprocessing
+import numpy as np
+from analytic import coopProbabilities, occupancies
+from population import perturbWeights, transferWeights
+from streams import streamSeed
+from stats import Moments, QuantileSketch
+
+"""Spatial populations. Instead of a well-mixed population where anyone can
+meet anyone, the players sit on the nodes of a graph (a grid, or a
+small-world ring) and only play their neighbors. Evolution is local too:
+after each generation's games, every player adopts the strategy of its best
+scoring neighbor if that neighbor scored more than itself, and then mutates
+with a small probability. All players update at the same time.
+
+A generation costs one game per link and one comparison per link, so its
+work grows with the number of links, never with the square of the number of
+players. The graph is kept as sparse adjacency arrays (the neighbors of node
+i are indices[indptr[i]:indptr[i + 1]]) and the genomes as one array, so
+millions of players fit in memory.
+
+The nodes are split into parts, contiguous ranges of nodes with about as
+many links each, that can each live in a worker process of their own. A
+part keeps the genomes and scores of its own nodes, plus copies of those of
+its halo, the neighbors of its nodes owned by other parts; between the
+steps of a generation only the halo copies are exchanged. The games are
+computed with array operations: the exact expected payoffs of SimplePlayers
+(see analytic.py), or the castles won of Blotto allocations. Random draws
+of a part are seeded from the run's seed, the part and the generation, so a
+run gives the same result with or without worker processes."""
+
+# links whose games are computed at once, to bound memory
+LINK_BLOCK = 2**16
+
+"""A graph as sparse adjacency arrays: the neighbors of node i are
+indices[indptr[i]:indptr[i + 1]], in increasing order. Links go both
+ways."""
+class Graph(object):
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    """The graph of size nodes with the links first[k] - second[k]. Links in
+    both directions, repeated links and links of a node to itself are
+    merged."""
+    @classmethod
+    def fromLinks(cls, size, first, second):
+        first, second = np.concatenate((first, second)), \
+            np.concatenate((second, first))
+        different = first != second
+        keys = np.unique(first[different].astype(np.int64) * size +
+                         second[different])
+        first, second = keys // size, keys % size
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(first, minlength=size))
+        return cls(indptr, second)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    # number of neighbors of every node
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    # number of links, each counted once
+    def numLinks(self):
+        return len(self.indices) / 2
+
+# rows and columns of the grid closest to a square with size nodes
+def gridShape(size):
+    rows = int(np.sqrt(size))
+    while size % rows != 0:
+        rows -= 1
+    return rows, size / rows
+
+"""A rows x columns grid wrapped into a torus, nodes numbered row by row.
+Each node is linked to its 4 nearest nodes, or its 8 nearest (the Moore
+neighborhood) if moore."""
+def gridGraph(rows, columns, moore=False):
+    nodes = np.arange(rows * columns)
+    row, column = nodes / columns, nodes % columns
+    offsets = [(0, 1), (1, 0)]
+    if moore:
+        offsets += [(1, 1), (1, -1)]
+    neighbors = [((row + dr) % rows) * columns + (column + dc) % columns
+                 for dr, dc in offsets]
+    return Graph.fromLinks(rows * columns, np.tile(nodes, len(offsets)),
+                           np.concatenate(neighbors))
+
+"""A Watts-Strogatz small world: a ring where each node is linked to the
+degree / 2 nearest nodes on each side, and then each link is moved, with
+probability rewiring, to a random node. Links that end up repeated or on
+their own node are dropped."""
+def smallWorldGraph(size, degree, rewiring, rng=np.random):
+    first = np.repeat(np.arange(size), degree / 2)
+    second = (first + np.tile(np.arange(1, degree / 2 + 1), size)) % size
+    rewired = rng.random_sample(len(first)) < rewiring
+    second[rewired] = rng.randint(0, size, rewired.sum())
+    return Graph.fromLinks(size, first, second)
+
+# the grid of size nodes, with 4 or 8 neighbors
+def _grid(size, degree, rewiring, rng=np.random):
+    if degree not in [4, 8]:
+        raise ValueError("grid nodes have 4 or 8 neighbors, not " +
+                         str(degree))
+    rows, columns = gridShape(size)
+    return gridGraph(rows, columns, degree == 8)
+
+# map from graph name to a function making a graph of size nodes
+graphs = {
+    'grid': _grid,
+    'smallworld': smallWorldGraph,
+    }
+
+"""The bounds of parts contiguous ranges of nodes with about as many links
+each: part i owns the nodes bounds[i] to bounds[i + 1]. On a grid the parts
+are bands of rows, and on a ring arcs, so few links cross parts."""
+def partition(graph, parts):
+    targets = graph.indptr[-1] * np.arange(1, parts) / float(parts)
+    cuts = np.searchsorted(graph.indptr, targets)
+    return np.concatenate(([0], cuts, [len(graph)]))
+
+"""A game played on the links of a spatial population"""
+class SpatialGame(object):
+    """The payoffs of the players with the genomes first[k] and second[k]
+    playing each other, as two arrays"""
+    def payoffs(self, first, second):
+        raise NotImplementedError("This function has not been implemented")
+
+    """Mutates every row of genomes in place"""
+    def mutate(self, genomes, rng):
+        raise NotImplementedError("This function has not been implemented")
+
+"""Prisoner's Dilemma between SimplePlayers, scored with the exact expected
+payoff of numMatches matches"""
+class SimpleGame(SpatialGame):
+    def __init__(self, coopcoop, coopdef, defdef, defcoop, numMatches):
+        # payoff of player 1 in each state 2 * move1 + move2, and of player 2
+        self.payoff = np.array([defdef, defcoop, coopdef, coopcoop], float)
+        self.swapped = self.payoff[[0, 2, 1, 3]]
+        self.numMatches = numMatches
+
+    def payoffs(self, first, second):
+        occupancy = occupancies(coopProbabilities(first),
+                                coopProbabilities(second), self.numMatches)
+        return occupancy.dot(self.payoff), occupancy.dot(self.swapped)
+
+    # perturbs a random weight by up to .01, like SimpleEvolution
+    def mutate(self, genomes, rng):
+        perturbWeights(genomes, genomes.shape[1], 0.01, rng)
+
+"""Blotto between allocations: castles won, 0.5 for each tie"""
+class BlottoGame(SpatialGame):
+    def payoffs(self, first, second):
+        diff = first - second
+        won = (diff > 0).sum(axis=1) + 0.5 * (diff == 0).sum(axis=1)
+        return won, first.shape[1] - won
+
+    # moves up to 1 soldier between two castles, like BlottoEvolution
+    def mutate(self, genomes, rng):
+        transferWeights(genomes, genomes.shape[1], 2, 100, rng)
+
+"""The nodes bounds[index] to bounds[index + 1] of a graph, with everything
+needed to play their games and update them: their links, in local numbers
+where the part's own nodes come first and its halo after them, and the
+genomes and scores of both."""
+class Part(object):
+    def __init__(self, graph, bounds, index, genomes, game, mutation, seed,
+                 sketchSize=1000):
+        self.index = index
+        self.game = game
+        self.mutation = mutation # probability a node mutates each generation
+        self.seed = seed
+        self.sketchSize = sketchSize # scores sampled for the quantiles
+        low, high = bounds[index], bounds[index + 1]
+        self.owned = high - low # number of nodes of the part
+
+        start, end = graph.indptr[low], graph.indptr[high]
+        neighbors = graph.indices[start:end]
+        outside = (neighbors < low) | (neighbors >= high)
+        self.halo = np.unique(neighbors[outside]) # global numbers
+        # the part that owns each halo node
+        self.owners = np.searchsorted(bounds, self.halo, side='right') - 1
+        self.indptr = graph.indptr[low:high + 1] - start
+        self.indices = neighbors - low
+        self.indices[outside] = self.owned + \
+            np.searchsorted(self.halo, neighbors[outside])
+        self.degrees = np.diff(self.indptr)
+        self.rows = np.repeat(np.arange(self.owned), self.degrees)
+        # each link played once: links within the part from their lower end
+        once = outside | (self.rows < self.indices)
+        self.first = self.rows[once]
+        self.second = self.indices[once]
+
+        size = self.owned + len(self.halo)
+        self.genomes = np.zeros((size, genomes.shape[1]))
+        self.genomes[:self.owned] = genomes[low:high]
+        self.scores = np.zeros(size)
+        # local numbers of the own nodes in the halo of each other part
+        self.exports = {}
+
+    """The values ('genomes' or 'scores') of the own nodes that other parts
+    have in their halo, by part"""
+    def send(self, name):
+        values = getattr(self, name)
+        return dict((part, values[nodes])
+                    for part, nodes in self.exports.items())
+
+    """Takes in the values of the halo, sent by the parts that own it"""
+    def receive(self, name, pieces):
+        if pieces:
+            # halo nodes are sorted, so they are grouped by owner
+            getattr(self, name)[self.owned:] = \
+                np.concatenate([pieces[part] for part in sorted(pieces)])
+
+    """Plays the games of every link of the own nodes, scoring each node
+    with its mean payoff against its neighbors"""
+    def play(self):
+        total = np.zeros(len(self.scores))
+        for start in range(0, len(self.first), LINK_BLOCK):
+            first = self.first[start:start + LINK_BLOCK]
+            second = self.second[start:start + LINK_BLOCK]
+            payoff1, payoff2 = self.game.payoffs(self.genomes[first],
+                                                 self.genomes[second])
+            total += np.bincount(first, payoff1, len(total))
+            total += np.bincount(second, payoff2, len(total))
+        self.scores[:self.owned] = total[:self.owned] / \
+            np.maximum(self.degrees, 1)
+
+    """Every own node adopts the genome of its best neighbor, when that one
+    scored more, then mutates with probability mutation. Returns a summary
+    of the scores before the update."""
+    def adopt(self, generation):
+        rng = np.random.RandomState(streamSeed(self.seed, 'part', self.index,
+                                               generation) % 2**32)
+        scores = self.scores[:self.owned]
+        # sorts the links of each node by decreasing neighbor score, ties in
+        # random order, so the first link of a node goes to its best neighbor
+        values = self.scores[self.indices]
+        order = np.lexsort((rng.random_sample(len(values)), -values,
+                            self.rows))
+        nodes = np.flatnonzero(self.degrees > 0)
+        best = order[self.indptr[nodes]]
+        better = values[best] > scores[nodes]
+        nodes, sources = nodes[better], self.indices[best[better]]
+        summary = self.summary(generation)
+        summary['adopted'] = len(nodes)
+        # the sources are read before any node is written
+        self.genomes[nodes] = self.genomes[sources]
+        mutated = np.flatnonzero(rng.random_sample(self.owned) <
+                                 self.mutation)
+        genomes = self.genomes[mutated]
+        self.game.mutate(genomes, rng)
+        self.genomes[mutated] = genomes
+        return summary
+
+    # the best own node and the statistics of the scores, before the update
+    def summary(self, generation):
+        scores = Moments()
+        scores.addAll(self.scores[:self.owned])
+        sketch = QuantileSketch(self.sketchSize, (self.index, generation))
+        sketch.addAll(self.scores[:self.owned])
+        summary = {'bestScore': None, 'bestGenome': None, 'scores': scores,
+                   'sketch': sketch}
+        if self.owned > 0:
+            best = np.argmax(self.scores[:self.owned])
+            summary['bestScore'] = float(self.scores[best])
+            summary['bestGenome'] = self.genomes[best].copy()
+        return summary
+
+    # the genomes and scores of the own nodes
+    def state(self):
+        return self.genomes[:self.owned], self.scores[:self.owned]
+
+# serves the calls of the main process on a part, in a worker process
+def _servePart(part, connection):
+    while True:
+        call = connection.recv()
+        if call is None:
+            break
+        method, arguments = call
+        connection.send(getattr(part, method)(*arguments))
+
+"""A population on a graph, split into parts, run in this process or with
+one worker process per part. genomes has a row per node; game is a
+SpatialGame; seed seeds the random draws of the parts."""
+class SpatialPopulation(object):
+    def __init__(self, graph, genomes, game, parts=1, processes=False,
+                 mutation=0.01, seed=0, sketchSize=1000):
+        self.graph = graph
+        bounds = partition(graph, parts)
+        self.parts = [Part(graph, bounds, i, genomes, game, mutation, seed,
+                           sketchSize)
+                      for i in range(parts)]
+        for part in self.parts:
+            for owner in np.unique(part.owners):
+                nodes = part.halo[part.owners == owner] - bounds[owner]
+                self.parts[owner].exports[part.index] = nodes
+
+        self.workers = []
+        self.connections = []
+        if processes:
+            # parts are forked into their workers, and only live there
+            for part in self.parts:
+                connection, child = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=_servePart,
+                                                 args=(part, child))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+                self.connections.append(connection)
+            self.parts = [None] * len(self.parts)
+
+    # calls method on every part, with the arguments of each part
+    def call(self, method, arguments):
+        if not self.workers:
+            return [getattr(part, method)(*args)
+                    for part, args in zip(self.parts, arguments)]
+        for connection, args in zip(self.connections, arguments):
+            connection.send((method, args))
+        return [connection.recv() for connection in self.connections]
+
+    # copies the values of every part's boundary nodes into the halos
+    def exchange(self, name):
+        sent = self.call('send', [(name,)] * len(self.parts))
+        received = [{} for part in self.parts]
+        for owner, pieces in enumerate(sent):
+            for part, piece in pieces.items():
+                received[part][owner] = piece
+        self.call('receive', [(name, pieces) for pieces in received])
+
+    """Plays a generation and updates every node. Returns the best score and
+    genome of the generation, the Moments and QuantileSketch of its scores
+    (see stats.py), merged from those of the parts, and the number of nodes
+    that adopted a neighbor's genome."""
+    def step(self, generation):
+        self.exchange('genomes')
+        self.call('play', [()] * len(self.parts))
+        self.exchange('scores')
+        summaries = self.call('adopt', [(generation,)] * len(self.parts))
+        best = max((s for s in summaries if s['bestScore'] is not None),
+                   key=lambda s: s['bestScore'])
+        scores, sketch = summaries[0]['scores'], summaries[0]['sketch']
+        for summary in summaries[1:]:
+            scores.merge(summary['scores'])
+            sketch.merge(summary['sketch'])
+        return {'bestScore': best['bestScore'],
+                'bestGenome': best['bestGenome'],
+                'scores': scores, 'sketch': sketch,
+                'adopted': sum(s['adopted'] for s in summaries)}
+
+    """The genomes of all nodes, and their scores in the last generation"""
+    def state(self):
+        states = self.call('state', [()] * len(self.parts))
+        return np.concatenate([genomes for genomes, scores in states]), \
+            np.concatenate([scores for genomes, scores in states])
+
+    # stops the workers
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.connections = []
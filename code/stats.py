@@ -0,0 +1,219 @@
+import math
+import random
+
+"""Online statistics of a run, with memory that doesn't grow with the
+population. Scores go through a Moments (count, mean and variance by
+Welford's method) and a QuantileSketch (a uniform reservoir sample of at
+most size scores); both take values one at a time or a whole array at once,
+and two of them can be merged, so parts of a population summarized
+separately (like the parts of a spatial population) give the statistics of
+the whole. Tournaments count the cooperative moves as they play them, and
+the diversity of the genomes is estimated from a sample of pairs.
+
+A player's score is only known once all its matches are played, so the
+moments and the quantile sample of the scores are taken after each
+tournament, in one pass over the final scores (an array operation for
+compact and spatial populations, a loop over the players otherwise), not
+updated match by match. That pass is small next to the tournament, which
+looks at every player once per match.
+
+The statistics draw their random numbers from generators of their own, so
+they don't change the course of a seeded run."""
+
+"""Count, mean and variance of a stream of values"""
+class Moments(object):
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squares = 0.0 # sum of squared differences from the mean
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squares += delta * (value - self.mean)
+
+    """Adds every value of a list or array. Arrays are summarized with array
+    operations and merged in."""
+    def addAll(self, values):
+        if isinstance(values, list):
+            for value in values:
+                self.add(float(value))
+            return
+        if len(values) > 0:
+            batch = Moments()
+            batch.count = len(values)
+            batch.mean = float(values.mean())
+            batch.squares = float(((values - batch.mean) ** 2).sum())
+            self.merge(batch)
+
+    """Adds the values summarized by other, by Chan's formula"""
+    def merge(self, other):
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.squares += other.squares + \
+            delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.squares / (self.count - 1)
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+"""Quantiles of a stream of values, estimated from a uniform sample of at
+most size of them, kept by reservoir sampling"""
+class QuantileSketch(object):
+    def __init__(self, size=1000, seed=0):
+        self.size = size
+        self.sample = []
+        self.count = 0 # values seen
+        self.rng = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        if len(self.sample) < self.size:
+            self.sample.append(value)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < self.size:
+                self.sample[slot] = value
+
+    """Adds every value of a list or array. A batch into an empty sketch is
+    sampled directly, without looking at every value."""
+    def addAll(self, values):
+        if self.count == 0 and len(values) > self.size:
+            indices = self.rng.sample(xrange(len(values)), self.size)
+            self.sample = [float(values[i]) for i in indices]
+            self.count = len(values)
+            return
+        for value in values:
+            self.add(float(value))
+
+    """Adds the values sampled by other: every value of the merged sample
+    comes from one sketch or the other in proportion to the values they
+    saw"""
+    def merge(self, other):
+        count = self.count + other.count
+        if count <= self.size:
+            self.sample += other.sample
+        else:
+            mine = list(self.sample)
+            theirs = list(other.sample)
+            self.rng.shuffle(mine)
+            self.rng.shuffle(theirs)
+            sample = []
+            seen = [self.count, other.count]
+            while len(sample) < self.size and (mine or theirs):
+                if theirs and (not mine or self.rng.random() *
+                               sum(seen) >= seen[0]):
+                    sample.append(theirs.pop())
+                    seen[1] -= 1
+                else:
+                    sample.append(mine.pop())
+                    seen[0] -= 1
+            self.sample = sample
+        self.count = count
+
+    # the q-quantile of the sample, for q between 0 and 1
+    def quantile(self, q):
+        if not self.sample:
+            return None
+        ordered = sorted(self.sample)
+        return ordered[int(round(q * (len(ordered) - 1)))]
+
+    # the minimum, quartiles and maximum of the sample
+    def quartiles(self):
+        ordered = sorted(self.sample)
+        if not ordered:
+            return []
+        return [ordered[int(round(k * (len(ordered) - 1) / 4.0))]
+                for k in range(5)]
+
+"""Mean Euclidean distance between the genomes of pairs of different
+players, over samples random pairs. genomes is a list of weight lists, or
+an array with a row per player; shorter weight lists count as padded with
+zeros."""
+def diversity(genomes, samples=1000, rng=None):
+    if rng is None:
+        rng = random.Random(0)
+    if len(genomes) < 2:
+        return 0.0
+    pairs = [rng.sample(xrange(len(genomes)), 2) for k in range(samples)]
+    if not isinstance(genomes, list):
+        first, second = zip(*pairs)
+        diff = genomes[list(first)] - genomes[list(second)]
+        return float(((diff ** 2).sum(axis=1) ** 0.5).mean())
+    total = 0.0
+    for i, j in pairs:
+        first, second = list(genomes[i]), list(genomes[j])
+        width = max(len(first), len(second))
+        first += [0] * (width - len(first))
+        second += [0] * (width - len(second))
+        total += math.sqrt(sum((float(a) - float(b)) ** 2
+                               for a, b in zip(first, second)))
+    return total / samples
+
+"""The statistics of one scored generation: the moments and quantiles of
+its scores, the diversity of its genomes and the rate of cooperative moves
+its tournament played (None if it counted none)"""
+class GenerationStats(object):
+    def __init__(self, generation, size=1000):
+        self.generation = generation
+        self.scores = Moments()
+        self.sketch = QuantileSketch(size, seed=generation)
+        self.size = size
+        self.diversity = None
+        self.cooperations = 0
+        self.moves = 0
+
+    """Adds the scores and genomes of players, a list of Players or a
+    Population"""
+    def addPlayers(self, players):
+        if isinstance(players, list):
+            scores = [p.score for p in players]
+            genomes = [p.weights for p in players]
+        else:
+            scores = players.scores
+            genomes = players.weights
+        self.scores.addAll(scores)
+        self.sketch.addAll(scores)
+        self.diversity = diversity(genomes, self.size,
+                                   random.Random(self.generation))
+
+    # adds scores summarized elsewhere, by a Moments and a QuantileSketch
+    def addSummary(self, scores, sketch):
+        self.scores.merge(scores)
+        self.sketch.merge(sketch)
+
+    # adds the cooperative moves counted by a tournament, if it counts them
+    def addTournament(self, tournament):
+        self.cooperations += getattr(tournament, 'cooperations', 0)
+        self.moves += getattr(tournament, 'moves', 0)
+
+    def cooperationRate(self):
+        if self.moves == 0:
+            return None
+        return float(self.cooperations) / self.moves
+
+    # the statistics as a dict of plain numbers
+    def summary(self):
+        return {'meanScore': self.scores.mean, 'stdScore': self.scores.std(),
+                'quartiles': self.sketch.quartiles(),
+                'diversity': self.diversity,
+                'cooperationRate': self.cooperationRate()}
+
+    def __str__(self):
+        line = "Scores: mean %.2f sd %.2f quartiles %s" % (
+            self.scores.mean, self.scores.std(),
+            ' '.join('%.2f' % q for q in self.sketch.quartiles()))
+        if self.diversity is not None:
+            line += ", diversity %.4f" % self.diversity
+        if self.moves > 0:
+            line += ", cooperation %.3f" % self.cooperationRate()
+        return line
@@ -0,0 +1,54 @@
+import random
+import hashlib
+
+"""Seeded random streams for tournaments. Without streams, every move is
+drawn from the global random module, so a player's luck depends on
+everything drawn before it. With streams, the draws of a tournament are
+split into independent streams, each seeded from the tournament's seed and
+a key naming what the stream is for, so they don't depend on the order the
+pairs are played in, or on which worker process plays them.
+
+In 'pair' mode, the two players of a pair draw from the stream of the pair
+in the round, keyed on their ids. In 'common' mode (common random numbers),
+the stream of a player is keyed on its seat in the pair instead, so every
+candidate in the same seat of a round is scored against the same random
+draws, and the differences in score between candidates come from their
+strategies rather than their luck."""
+
+MODES = ['pair', 'common']
+
+""" a seed for the stream named by the key, a tuple of numbers and strings,
+spread over 64 bits """
+def streamSeed(*key):
+    name = ' '.join(str(part) for part in key)
+    return int(hashlib.md5(name).hexdigest()[:16], 16)
+
+""" a new random.Random for the stream named by the key """
+def stream(*key):
+    return random.Random(streamSeed(*key))
+
+class Streams(object):
+    def __init__(self, seed, mode='pair'):
+        if mode not in MODES:
+            raise ValueError("unknown stream mode " + str(mode))
+        self.seed = seed # seed of the tournament
+        self.mode = mode # 'pair' or 'common'
+
+    """The random generators of the first and second player of a pair in
+    round r"""
+    def pair(self, r, player1, player2):
+        if self.mode == 'common':
+            return stream(self.seed, r, 'seat', 0), \
+                stream(self.seed, r, 'seat', 1)
+        shared = stream(self.seed, r, 'pair', player1.id, player2.id)
+        return shared, shared
+
+    """A numpy RandomState for all pairs of round r, for the batched engine"""
+    def roundState(self, r):
+        import numpy as np
+        return np.random.RandomState(streamSeed(self.seed, r, 'round') %
+                                     2**32)
+
+    # in common mode, every player in a seat draws the same numbers
+    def common(self):
+        return self.mode == 'common'
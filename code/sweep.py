@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import random
+import hashlib
+import itertools
+import multiprocessing
+
+"""Parameter sweeps. A sweep runs one experiment (see experiment.py) per
+cell of a design, a grid or a random sample of settings such as the payoffs,
+numToEvolve, numClones or the evolution type, in a pool of worker processes.
+Every cell gets its own seed, derived from the sweep's seed and the cell's
+settings, so a cell gives the same result whichever worker runs it and
+whenever it runs.
+
+The sweep directory is the results store: each finished cell is a JSON file
+named after the hash of its settings and the sweep's seed, with the
+settings, the seeds, the best score of every generation and the final
+strategies. Cells already in the directory are skipped, so an interrupted
+sweep picks up where it stopped, while the same cells swept with another
+seed are run again, and aggregate() reads all of them back into one
+table.
+
+python sweep.py DIR [--grid NAME=V1,V2,... ...] [--random N
+    --draw NAME=LOW:HIGH|NAME=V1,V2,... ...] [--set NAME=VALUE ...]
+    [--workers K] [--seed S]
+
+The cells run their tournaments sequentially: worker processes of a pool
+can't start processes of their own, so 'parallelism' and 'islands' can't be
+set."""
+
+"""The cells of a full grid: every combination of the values of axes, a dict
+from setting name to list of values"""
+def grid(axes):
+    names = sorted(axes)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[axes[name] for name in names])]
+
+"""count cells drawn at random from ranges, a dict from setting name to a
+list of values to choose from or a (low, high) pair to draw uniformly from,
+integers if both are integers"""
+def randomDesign(ranges, count, seed=None):
+    rng = random.Random(seed)
+    cells = []
+    for i in range(count):
+        cell = {}
+        for name in sorted(ranges):
+            values = ranges[name]
+            if isinstance(values, list):
+                cell[name] = rng.choice(values)
+            elif all(isinstance(bound, int) for bound in values):
+                cell[name] = rng.randint(values[0], values[1])
+            else:
+                cell[name] = rng.uniform(values[0], values[1])
+        cells.append(cell)
+    return cells
+
+# the settings of a cell as canonical JSON
+def _canonical(config):
+    return json.dumps(config, sort_keys=True)
+
+""" the name of a cell in the results store, from its settings and the
+sweep seed """
+def cellKey(config, seed):
+    return hashlib.md5('%s %s' % (seed, _canonical(config))).hexdigest()[:16]
+
+""" the seed of a cell: the same for the same settings and sweep seed """
+def cellSeed(config, seed):
+    digest = hashlib.md5('%s %s' % (seed, _canonical(config))).hexdigest()
+    return int(digest[:8], 16)
+
+# the file of a cell in the results store
+def cellPath(directory, config, seed):
+    return os.path.join(directory, 'cell_%s.json' % cellKey(config, seed))
+
+""" the final strategies of a run: the weights of the best player of its
+last scored generation, the strategy main.py prints as best, and the
+average strategy of the final players of the same type. Either is None
+when there is none: no generation ran, or no final player has the best
+player's type. """
+def strategies(result):
+    if result['bestWeights'] is None:
+        return None, None
+    best = [float(w) for w in result['bestWeights']]
+    same = [p.weights for p in result['players']
+            if len(p.weights) == len(best)]
+    if not same:
+        return best, None
+    mean = [sum(float(w[i]) for w in same) / len(same)
+            for i in range(len(best))]
+    return best, mean
+
+# runs a cell in a worker process and returns its summary
+def _runCell(task):
+    config, seed, sweepSeed = task
+    from experiment import runExperiment
+    result = runExperiment(dict(config, seed=seed))
+    best, mean = strategies(result)
+    return {'config': config, 'seed': seed, 'sweepSeed': sweepSeed,
+            'bestScores': [float(s) for s in result['bestScores']],
+            'strategy': best, 'meanStrategy': mean}
+
+# writes the summary of a finished cell, atomically
+def _writeCell(directory, summary):
+    path = cellPath(directory, summary['config'], summary['sweepSeed'])
+    with open(path + '.partial', 'w') as f:
+        json.dump(summary, f, sort_keys=True)
+    os.rename(path + '.partial', path)
+
+"""Runs the cells not yet in directory, each being the settings of cell on
+top of the settings of fixed, in a pool of workers processes (in this
+process if 0). Returns the number of cells run."""
+def runSweep(directory, cells, fixed=None, workers=1, seed=0, verbose=False):
+    fixed = fixed or {}
+    if fixed.get('parallelism', 0) > 0 or fixed.get('islands', 0) > 0 or \
+            any(c.get('parallelism', 0) > 0 or c.get('islands', 0) > 0
+                for c in cells):
+        raise ValueError("sweep cells can't use parallelism or islands")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tasks = []
+    for cell in cells:
+        config = dict(fixed, **cell)
+        if not os.path.exists(cellPath(directory, config, seed)):
+            tasks.append((config, cellSeed(config, seed), seed))
+    if verbose:
+        print "Running", len(tasks), "of", len(cells), "cells"
+
+    if workers == 0:
+        summaries = itertools.imap(_runCell, tasks)
+    else:
+        # at most workers cells run at a time, and finished cells are
+        # written as soon as they come back
+        pool = multiprocessing.Pool(workers)
+        summaries = pool.imap_unordered(_runCell, tasks)
+    try:
+        for done, summary in enumerate(summaries):
+            _writeCell(directory, summary)
+            if verbose:
+                print "Finished cell", done + 1, "of", len(tasks), \
+                    _canonical(summary['config'])
+    finally:
+        if workers > 0:
+            pool.terminate()
+    return len(tasks)
+
+"""The finished cells of a sweep directory as rows: the settings, the sweep
+seed, the cell's seed, the final best score and the final strategies"""
+def aggregate(directory):
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith('cell_') or not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            summary = json.load(f)
+        row = dict(summary['config'])
+        row['sweepSeed'] = summary['sweepSeed']
+        row['seed'] = summary['seed']
+        row['finalBestScore'] = summary['bestScores'][-1] \
+            if summary['bestScores'] else None
+        row['strategy'] = summary['strategy']
+        row['meanStrategy'] = summary['meanStrategy']
+        rows.append(row)
+    return rows
+
+"""The rows as a tab-separated table, with the settings that vary first"""
+def formatTable(rows):
+    if not rows:
+        return ''
+    results = ['seed', 'finalBestScore', 'strategy', 'meanStrategy']
+    names = sorted(set(name for row in rows for name in row) - set(results))
+    varying = [name for name in names
+               if len(set(_canonical(row.get(name)) for row in rows)) > 1]
+    columns = varying + results
+    lines = ['\t'.join(columns)]
+    for row in sorted(rows, key=lambda row: [row.get(name)
+                                             for name in varying]):
+        cells = []
+        for name in columns:
+            value = row.get(name)
+            if isinstance(value, list):
+                value = ' '.join('%.4f' % v for v in value)
+            elif isinstance(value, float):
+                value = '%.4f' % value
+            cells.append(str(value))
+        lines.append('\t'.join(cells))
+    return '\n'.join(lines)
+
+# a setting from the command line: a number, true/false or a string
+def _value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+# the NAME=VALUE arguments following a flag, until the next flag
+def _assignments(args, flag):
+    if flag not in args:
+        return []
+    index = args.index(flag)
+    end = index + 1
+    while end < len(args) and not args[end].startswith('--'):
+        end += 1
+    assignments = [arg.split('=', 1) for arg in args[index + 1:end]]
+    del args[index:end]
+    return assignments
+
+def main(args):
+    args = list(args)
+    workers = 1
+    seed = 0
+    count = 0
+    if '--workers' in args:
+        index = args.index('--workers')
+        workers = int(args[index + 1])
+        del args[index:index + 2]
+    if '--seed' in args:
+        index = args.index('--seed')
+        seed = int(args[index + 1])
+        del args[index:index + 2]
+    if '--random' in args:
+        index = args.index('--random')
+        count = int(args[index + 1])
+        del args[index:index + 2]
+    axes = dict((name, [_value(v) for v in values.split(',')])
+                for name, values in _assignments(args, '--grid'))
+    ranges = {}
+    for name, values in _assignments(args, '--draw'):
+        if ':' in values:
+            ranges[name] = tuple(_value(v) for v in values.split(':'))
+        else:
+            ranges[name] = [_value(v) for v in values.split(',')]
+    fixed = dict((name, _value(value))
+                 for name, value in _assignments(args, '--set'))
+    if len(args) != 1:
+        print __doc__
+        return 1
+
+    # every cell of the grid with each of the random draws
+    cells = grid(axes)
+    if count > 0:
+        cells = [dict(drawn, **cell) for cell in cells
+                 for drawn in randomDesign(ranges, count, seed)]
+    runSweep(args[0], cells, fixed, workers, seed, verbose=True)
+    print formatTable(aggregate(args[0]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,8 +1,11 @@
 import random
-import thread
-import threading
+import multiprocessing
+import copy
 import datetime
+import math
+import bisect
 from player import *
+from pairing import *
 
 """Interface. A class that runs a tournament. A match is defined as a single
 instance of the game between two people. In each round, we create a perfect
@@ -11,64 +14,133 @@ tournament, we run multiple rounds. We return the cumulative score over all
 rounds for each player."""
 
 class Tournament(object):
-    def __init__(self, players, parallelism):
+    # cooperative moves and moves played, counted by the tournaments of
+    # games with cooperation
+    cooperations = 0
+    moves = 0
+
+    def __init__(self, players, parallelism, pairing=None):
         self.players = players # input list of players
-        self.parallelism = parallelism # use parallelism
+        self.parallelism = parallelism # number of worker processes, 0 = none
+        # decides who plays whom in each round, random by default
+        if pairing is None:
+            pairing = RandomPairing()
+        self.pairing = pairing
         pass
 
     # runs a specified number of rounds
     def runTournament(self):
-        for i in range (0, self.numRounds):
-            # if not in parallel, run rounds where matches are sequential
-            if (self.parallelism == 0):
-                self.runRound()
-            # otherwise, run rounds where matches are parallelized
-            else:
-                self.runRoundParallelism()
-        return self.players    
+        # compact populations are played as Player objects, and get the
+        # scores back at the end
+        if not isinstance(self.players, list):
+            population = self.players
+            self.players = population.toPlayers()
+            self.runTournament()
+            population.scores[:] = self.scores()
+            self.players = population
+            return population
+
+        # the pairings of all rounds are computed once per tournament
+        self.pairing.schedule(len(self.players), self.numRounds)
+        # the worker processes are shared by all rounds of the tournament
+        if (self.parallelism > 0):
+            self.pool = multiprocessing.Pool(self.parallelism)
+        try:
+            for self.round in range (0, self.numRounds):
+                # if not in parallel, run rounds where matches are sequential
+                if (self.parallelism == 0):
+                    self.runRound()
+                # otherwise, run rounds where matches are parallelized
+                else:
+                    self.runRoundParallelism()
+        finally:
+            if (self.parallelism > 0):
+                self.pool.terminate()
+                del self.pool
+        return self.players
+
+    # the pool and the schedule are not needed by the worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('pool', None)
+        state.pop('pairing', None)
+        return state
+
+    # the current cumulative score of every player
+    def scores(self):
+        return [player.score for player in self.players]
 
-    # creates a perfect pairing of the players
+    # returns the pairing of the current round as an order of player indices,
+    # where order[2i] plays order[2i+1]
     def createPairing(self):
-        #creates a pairing by using sample to get a permutation of the players
-        return random.sample(self.players, len(self.players))
+        return self.pairing.roundOrder(self.round, self)
 
     # creates a perfect pairing and runs a specified number of
     # matches between every pair
     def runRound(self):
         # a perfect pairing
-        randomizedPlayers = self.createPairing()
+        order = self.createPairing()
 
         # loops through all pairs
-        for i in range (0, len(self.players), 2):
+        for i in range (0, len(order) - 1, 2):
             # runs matches between a pair
-            for j in range (0,self.numMatches, 1):
-                self.runSingleMatch(i, i+1)
+            self.runMatches(order[i], order[i+1])
         return
 
-    # runs a number of matches between pairs. helper for parallelized matches.
-    def runMatches(self, i):
+    # runs a number of matches between a pair
+    def runMatches(self, p1, p2):
         for j in range (0,self.numMatches, 1):
-            self.runSingleMatch(i,i+1)
+            self.runSingleMatch(p1, p2)
 
-    # runs a round, but parallelizes each pair
+    # runs a round, but splits the pairs into one chunk per worker process.
+    # The players of each chunk are pickled to their worker and back every
+    # round; only the batched Prisoner's Dilemma engine shares its arrays
+    # with the workers instead (see shared.py).
     def runRoundParallelism(self):
         # a perfect pairing
-        randomizedPlayers = self.createPairing()
+        order = self.createPairing()
 
-        # creates a new thread for each pair and runs matches between the pair
-        for i in range (0, len(self.players), 2):
-            thread.start_new_thread(self.runMatches,(i,))
+        # chunk boundaries, always on a pair boundary
+        numPairs = len(order) / 2
+        bounds = [2 * (numPairs * k / self.parallelism)
+                  for k in range(self.parallelism + 1)]
 
-        # makes sure all threads are finished
-        while (threading.activeCount() > 1):
-            pass
+        # each chunk gets its own seed, drawn here so that the results don't
+        # depend on which worker runs which chunk
+        tasks = []
+        for k in range(self.parallelism):
+            chunk = copy.copy(self)
+            chunk.cooperations = chunk.moves = 0
+            chunk.players = [self.players[i]
+                             for i in order[bounds[k]:bounds[k + 1]]]
+            tasks.append((chunk, random.randrange(0, 2**31)))
+
+        # copies the updated scores and histories back, in chunk order
+        results = self.pool.map(_runChunk, tasks)
+        for k in range(self.parallelism):
+            players, cooperations, moves = results[k]
+            self.cooperations += cooperations
+            self.moves += moves
+            for i, player in enumerate(players):
+                self.players[order[bounds[k] + i]].__dict__.update(
+                    player.__dict__)
+
+# runs all pairs of a chunk in a worker process. helper for parallelized
+# rounds.
+def _runChunk(task):
+    chunk, seed = task
+    random.seed(seed)
+    for i in range (0, len(chunk.players), 2):
+        chunk.runMatches(i, i+1)
+    return chunk.players, chunk.cooperations, chunk.moves
 
 """A specific Tournament for Prisoner's Dilemma"""
 class PrisonersDilemmaTournament(Tournament):
     
     def __init__(self, players, parallelism, coopcoop, coopdef, defdef,
-                 defcoop, numMatches, numRounds):
-        super(PrisonersDilemmaTournament, self).__init__(players, parallelism)
+                 defcoop, numMatches, numRounds, pairing=None, streams=None):
+        super(PrisonersDilemmaTournament, self).__init__(players, parallelism,
+                                                         pairing)
         # payoff values
         self.coopcoop = coopcoop # p1: coop, p2: coop
         self.coopdef = coopdef # p1: coop, p2: def
@@ -76,6 +148,24 @@ class PrisonersDilemmaTournament(Tournament):
         self.defcoop = defcoop # p1: def, p2: coop
         self.numMatches = numMatches # number of matches to run for each pair
         self.numRounds = numRounds # number of rounds in a tournament
+        # seeded random streams the moves are drawn from (see streams.py),
+        # or None for the random module
+        self.streams = streams
+
+    # runs the matches between a pair, with the players drawing their moves
+    # from the streams of the pair if the tournament has streams
+    def runMatches(self, p1, p2):
+        if self.streams is None:
+            return super(PrisonersDilemmaTournament, self).runMatches(p1, p2)
+        player1 = self.players[p1]
+        player2 = self.players[p2]
+        player1.rng, player2.rng = self.streams.pair(self.round, player1,
+                                                     player2)
+        try:
+            super(PrisonersDilemmaTournament, self).runMatches(p1, p2)
+        finally:
+            del player1.rng
+            del player2.rng
 
     # runs a single match of Prisoner's Dilemma between two players
     def runSingleMatch(self, p1, p2):
@@ -86,6 +176,8 @@ class PrisonersDilemmaTournament(Tournament):
         # updates player's information to keep track of opponent's last moves
         self.players[p1].informMove(move2)
         self.players[p2].informMove(move1)
+        self.cooperations += move1 + move2
+        self.moves += 2
 
         # determines the outcome of the match and updates the scores
         if (move1 == move2):
@@ -109,19 +201,75 @@ class PrisonersDilemmaTournament(Tournament):
         return
 
 
-"""A specific Tournament for Blotto"""
+"""A specific Tournament for Blotto. A Blotto match is deterministic, so the
+outcome of a pair is computed once for all its matches. If a cache (an
+LRUCache) is given, outcomes are also kept across rounds and generations,
+keyed on the two allocations."""
 class BlottoTournament(Tournament):
 
     def __init__(self, players, parallelism, numMatches, numRounds, castles,\
-                 soldiers):
-        super(BlottoTournament, self).__init__(players, parallelism)
+                 soldiers, pairing=None, cache=None):
+        super(BlottoTournament, self).__init__(players, parallelism, pairing)
         self.numMatches = numMatches # number of matches to run between a pair
         self.numRounds = numRounds # number of rounds in a tournament
         self.castles = castles # number of castles. 
         self.soldiers = soldiers # number of soldiers.
+        self.cache = cache # castles won, keyed on pairs of allocations
+
+    # runs the tournament, after giving identical allocations a shared key
+    def runTournament(self):
+        if isinstance(self.players, list) and self.cache is not None:
+            keys = {}
+            self.keys = []
+            for player in self.players:
+                key = tuple(map(int, player.weights))
+                self.keys.append(keys.setdefault(key, key))
+        return super(BlottoTournament, self).runTournament()
+
+    # the cache stays in the main process
+    def __getstate__(self):
+        state = super(BlottoTournament, self).__getstate__()
+        state.pop('cache', None)
+        state.pop('keys', None)
+        return state
+
+    # runs the matches between a pair, which all have the same outcome
+    def runMatches(self, p1, p2):
+        castlesWon = self.castlesWon(p1, p2)
+        self.players[p1].score += castlesWon * self.numMatches
+        self.players[p2].score += (10 - castlesWon) * self.numMatches
 
     # runs a single instance of Blotto between two players
     def runSingleMatch(self, p1, p2):
+        castlesWon = self.castlesWon(p1, p2)
+
+        # updates scores        
+        self.players[p1].score += castlesWon
+        self.players[p2].score += 10 - castlesWon
+
+        return
+
+    # the number of castles p1 wins against p2, from the cache if possible
+    def castlesWon(self, p1, p2):
+        if getattr(self, 'cache', None) is None:
+            return self.playCastles(p1, p2)
+        key1 = self.keys[p1]
+        key2 = self.keys[p2]
+        # identical allocations tie on every castle
+        if key1 is key2:
+            return 0.5 * self.castles
+        # only one order of each pair is stored, since p2 wins the castles
+        # p1 doesn't
+        if key1 > key2:
+            return self.castles - self.castlesWon(p2, p1)
+        castlesWon = self.cache.get((key1, key2))
+        if castlesWon is None:
+            castlesWon = self.playCastles(p1, p2)
+            self.cache.put((key1, key2), castlesWon)
+        return castlesWon
+
+    # plays the castles of a match between two players
+    def playCastles(self, p1, p2):
         # the moves the players will choose
         move1 = self.players[p1].returnMove(self.players[p2])
         move2 = self.players[p2].returnMove(self.players[p1])
@@ -137,9 +285,126 @@ class BlottoTournament(Tournament):
             # if p1, p2 have equal soldiers in the castle, add 0.5
             elif (move1[i] == move2[i]):
                 castlesWon += 0.5
-                
-        # updates scores        
-        self.players[p1].score += castlesWon
-        self.players[p2].score += 10 - castlesWon
 
-        return
+        return castlesWon
+
+"""A Prisoner's Dilemma tournament that races the players for the top
+places: each round is a sample of a player's score per round, and players
+stop being sampled once they can't change the top players. Once a
+player's confidence interval puts it surely inside or surely outside the
+top players, it stops; and by successive halving, every minRounds rounds
+the worse half of the players still racing, by mean round score, stops too,
+as long as at least top players keep racing. Players that stopped early are
+scored with their mean score per round times the number of rounds, so the
+scores stay on the scale of a full tournament.
+
+Each round pairs all the players at random, as a full tournament does, and
+only plays the pairs where at least one player is still racing; players
+that stopped keep serving as opponents, so every player's samples come from
+the same mix of opponents and the means compared are of the same quantity.
+The pairing and parallelism of the tournament are not used, and the players
+must be a list of Players."""
+class RacingPrisonersDilemmaTournament(PrisonersDilemmaTournament):
+
+    def __init__(self, players, parallelism, coopcoop, coopdef, defdef,
+                 defcoop, numMatches, numRounds, top, confidence=2.0,
+                 minRounds=3, streams=None):
+        super(RacingPrisonersDilemmaTournament, self).__init__(players,
+            parallelism, coopcoop, coopdef, defdef, defcoop, numMatches,
+            numRounds, None, streams)
+        self.top = top # number of top places the players race for
+        # half-width of the confidence intervals, in standard errors
+        self.confidence = confidence
+        # rounds everyone plays before deciding, and between halvings
+        self.minRounds = minRounds
+        self.matchesPlayed = 0 # matches played in the last tournament
+        self.matchesSaved = 0 # matches a full tournament would have added
+
+    # runs rounds until every player is decided or the rounds run out
+    def runTournament(self):
+        if not isinstance(self.players, list):
+            raise ValueError("racing tournaments need a list of Players")
+        count = len(self.players)
+        start = [player.score for player in self.players]
+        # the number, sum and sum of squares of each player's round scores
+        self.samples = [0] * count
+        self.sums = [0.0] * count
+        self.squares = [0.0] * count
+        racing = [True] * count # whether each player is still sampled
+        order = range(count)
+        self.matchesPlayed = 0
+        for self.round in range(0, self.numRounds):
+            if not any(racing):
+                break
+            random.shuffle(order)
+            for i in range(0, count - 1, 2):
+                if racing[order[i]] or racing[order[i + 1]]:
+                    self.runSample(order[i], order[i + 1], racing)
+            if self.round + 1 >= self.minRounds:
+                racing = [still and not decided for still, decided
+                          in zip(racing, self.decided())]
+                if (self.round + 1) % self.minRounds == 0:
+                    racing = self.halve(racing)
+
+        for i, player in enumerate(self.players):
+            if self.samples[i] > 0:
+                player.score = start[i] + \
+                    self.sums[i] / self.samples[i] * self.numRounds
+        self.matchesSaved = \
+            self.numRounds * (count / 2) * self.numMatches - self.matchesPlayed
+        return self.players
+
+    # plays the matches of a pair and records the scores as a sample of the
+    # players still racing
+    def runSample(self, p1, p2, racing):
+        before1 = self.players[p1].score
+        before2 = self.players[p2].score
+        self.runMatches(p1, p2)
+        self.matchesPlayed += self.numMatches
+        for p, before in ((p1, before1), (p2, before2)):
+            if not racing[p]:
+                continue
+            sample = self.players[p].score - before
+            self.samples[p] += 1
+            self.sums[p] += sample
+            self.squares[p] += sample * sample
+
+    # stops the worse half of the players still racing, by mean round score,
+    # keeping at least top of them racing
+    def halve(self, racing):
+        still = [p for p in range(len(racing)) if racing[p]]
+        keep = max(self.top, (len(still) + 1) / 2)
+        # players that sat out every round so far keep racing
+        still.sort(key=lambda p: -self.sums[p] / self.samples[p]
+                   if self.samples[p] > 0 else float('-inf'))
+        racing = list(racing)
+        for p in still[keep:]:
+            racing[p] = False
+        return racing
+
+    # the confidence interval of the mean round score of a player
+    def interval(self, p):
+        n = self.samples[p]
+        if n < 2:
+            return float('-inf'), float('inf')
+        mean = self.sums[p] / n
+        variance = max(self.squares[p] / n - mean * mean, 0) * n / (n - 1)
+        halfWidth = self.confidence * math.sqrt(variance / n)
+        return mean - halfWidth, mean + halfWidth
+
+    """For every player, whether it is surely in the top players (fewer than
+    top others can still be above it) or surely out of them (at least top
+    others are surely above it)"""
+    def decided(self):
+        intervals = [self.interval(p) for p in range(len(self.players))]
+        lowers = sorted(low for low, high in intervals)
+        uppers = sorted(high for low, high in intervals)
+        decided = []
+        for low, high in intervals:
+            # players whose interval starts above this one's end
+            above = len(lowers) - bisect.bisect_right(lowers, high)
+            # other players whose interval ends above this one's start
+            reach = len(uppers) - bisect.bisect_right(uppers, low) - \
+                (high > low)
+            decided.append(above >= self.top or reach < self.top)
+        return decided